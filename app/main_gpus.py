@@ -17,15 +17,20 @@ Manages multi-GPU resource allocation based on available memory
 """
 
 import os
+import re
 import sys
 import time
 import subprocess
+import tempfile
 import logging
 import argparse
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter
 from dataclasses import dataclass, field
 import psutil
 import threading
+import itertools
+import functools
 import concurrent.futures
 
 # 添加当前目录到 Python 路径
@@ -75,6 +80,7 @@ args = parse_arguments()
 
 # 日志目录配置
 log_dir = os.path.join(SCRIPT_DIR, 'logs')  # 使用项目根目录下的 logs 目录
+_LOG_INDEX_RE = re.compile(r'compete_gpus\((\d+)\)\.log$')  # 带编号的日志文件名
 
 # 命令文件路径：优先使用命令行参数，否则使用默认路径
 commands_path = parse_command_file_path(args, SCRIPT_DIR, 'command/command_gpus.txt')
@@ -106,6 +112,16 @@ retry_config = RetryConfig(
 
 
 
+# =============================================================================
+# 命令模板
+# =============================================================================
+
+@functools.lru_cache(maxsize=256)
+def render_command(cmd_template: str) -> str:
+    """替换命令模板中的变量（work_dir 在运行期间不变，结果按模板缓存，重试时不再重复解析）"""
+    return cmd_template.format(work_dir=work_dir)
+
+
 # =============================================================================
 # 任务数据结构（多GPU版本）
 # =============================================================================
@@ -158,6 +174,7 @@ class MultiGPUCompetitor:
         
         # 线程同步
         self.gpu_lock = threading.Lock()  # GPU 分配锁
+        self.gpu_released = threading.Condition(self.gpu_lock)  # GPU 释放时唤醒等待中的队列
         self.queue_locks: Dict[int, threading.Lock] = {}  # 每个队列一个锁
         
         # GPU 占用状态（调度器内部维护，不依赖nvidia-smi检测延迟）
@@ -165,14 +182,24 @@ class MultiGPUCompetitor:
         
         # 队列执行状态
         self.queue_futures: Dict[int, concurrent.futures.Future] = {}  # 队列 -> Future
+        self.running_tasks: Dict[int, Task] = {}  # queue_id -> 正在运行的任务（队内串行，每队至多一个）
         
         # 初始化任务队列
         self.tasks: List[Task] = []
         self.queues: Dict[int, List[Task]] = {}  # queue_id -> [tasks]
         self._setup_tasks()
         
+        # 命令文件热加载：记录加载时的修改时间，已结束的队列不再追加任务
+        self._reload_lock = threading.Lock()
+        self._commands_mtime = self._get_commands_mtime()
+        self._closed_queues: Set[int] = set()
+        
+        # 配置编号（init_status_writer 时设置），用于区分同时运行的多个调度器的任务日志
+        self.config_index = 0
+        
         # 运行状态
         self.running = True
+        self._stop_event = threading.Event()  # 停止时唤醒所有等待中的队列线程
         
         # 状态写入器
         self.status_writer: StatusWriter = None
@@ -200,14 +227,17 @@ class MultiGPUCompetitor:
         logging.info(f"📄 Command file: {commands_path}")
     
     def _get_next_log_file(self) -> str:
-        """获取下一个日志文件名"""
+        """获取下一个日志文件名（已有编号的最大值 + 1，只遍历一次目录）"""
         base = os.path.join(log_dir, 'compete_gpus')  # 多GPU专用日志
         if not os.path.exists(f"{base}.log"):
             return f"{base}.log"
-        i = 1
-        while os.path.exists(f"{base}({i}).log"):
-            i += 1
-        return f"{base}({i}).log"
+        indices = [0]
+        with os.scandir(log_dir) as entries:
+            for entry in entries:
+                m = _LOG_INDEX_RE.match(entry.name)
+                if m:
+                    indices.append(int(m.group(1)))
+        return f"{base}({max(indices) + 1}).log"
     
     def _setup_tasks(self):
         """从命令文件初始化任务列表（多GPU版本）"""
@@ -237,8 +267,14 @@ class MultiGPUCompetitor:
             # 为每个队列创建锁
             self.queue_locks[qid] = threading.Lock()
     
-    def _get_current_user_gpu_count(self) -> int:
-        """获取当前用户正在使用的GPU数量（调度器内部占用 + 外部进程占用）"""
+    def _get_current_user_gpu_count(self, snapshot: Optional[Dict[int, Dict]] = None) -> int:
+        """获取当前用户正在使用的GPU数量（调度器内部占用 + 外部进程占用）
+        
+        Args:
+            snapshot: GPUMonitor.snapshot() 结果，未提供时重新查询
+        """
+        if snapshot is None:
+            snapshot = GPUMonitor.snapshot()
         user_gpu_count = 0
         for gpu_id in self.gpus:
             # 检查调度器内部占用
@@ -246,21 +282,25 @@ class MultiGPUCompetitor:
                 user_gpu_count += 1
                 continue
             # 检查外部用户进程
-            user_procs = GPUMonitor.get_user_processes_on_gpu(gpu_id)
-            if user_procs:
+            if snapshot.get(gpu_id, {}).get("user_pids"):
                 user_gpu_count += 1
         return user_gpu_count
     
-    def _get_max_allowed_gpus(self) -> int:
+    def _get_max_allowed_gpus(self, snapshot: Optional[Dict[int, Dict]] = None) -> int:
         """动态计算当前允许使用的最大GPU数量
         
         公式：min(max_gpu, max(min_gpu, available_gpus - gpu_left))
         其中 available_gpus 是当前显存充足的GPU数量（不考虑用户占用）
+        
+        Args:
+            snapshot: GPUMonitor.snapshot() 结果，未提供时重新查询
         """
+        if snapshot is None:
+            snapshot = GPUMonitor.snapshot(with_processes=False)
         # 统计显存充足的GPU数量（available_gpus）
         available_gpus = 0
         for gpu_id in self.gpus:
-            available_mem = GPUMonitor.get_available_memory(gpu_id)
+            available_mem = snapshot.get(gpu_id, {}).get("free_gb", 0.0)
             if available_mem >= 1:  # 至少1GB可用显存才算可用
                 available_gpus += 1
         
@@ -268,17 +308,21 @@ class MultiGPUCompetitor:
         max_allowed = min(self.max_gpu, max(self.min_gpu, available_gpus - self.gpu_left))
         return max(0, max_allowed)
     
-    def _can_acquire_more_gpus(self, count: int = 1) -> bool:
+    def _can_acquire_more_gpus(self, count: int = 1, snapshot: Optional[Dict[int, Dict]] = None) -> bool:
         """检查是否可以再获取更多GPU
         
         Args:
             count: 需要获取的GPU数量
+            snapshot: GPUMonitor.snapshot() 结果，未提供时重新查询
         """
-        current_used = self._get_current_user_gpu_count()
-        max_allowed = self._get_max_allowed_gpus()
+        if snapshot is None:
+            snapshot = GPUMonitor.snapshot()
+        current_used = self._get_current_user_gpu_count(snapshot)
+        max_allowed = self._get_max_allowed_gpus(snapshot)
         return current_used + count <= max_allowed
 
-    def find_available_gpus(self, gpu_count: int, required_memory: int, queue_id: int = -1) -> Optional[List[int]]:
+    def find_available_gpus(self, gpu_count: int, required_memory: int, queue_id: int = -1,
+                            snapshot: Optional[Dict[int, Dict]] = None) -> Optional[List[int]]:
         """查找多个可用的 GPU
         
         条件：
@@ -293,15 +337,21 @@ class MultiGPUCompetitor:
             gpu_count: 需要的 GPU 数量
             required_memory: 每张 GPU 需要的显存 (GB)
             queue_id: 请求GPU的队列ID（用于日志）
+            snapshot: GPUMonitor.snapshot() 结果，未提供时重新查询
             
         Returns:
             可用的 GPU ID 列表，如果不足则返回 None
         """
+        # 整轮查找共用一次 GPU 快照，避免逐 GPU 调用 nvidia-smi
+        if snapshot is None:
+            snapshot = GPUMonitor.snapshot()
+        
         # 动态预留检查：是否还能获取更多GPU
-        if not self._can_acquire_more_gpus(gpu_count):
-            current_used = self._get_current_user_gpu_count()
-            max_allowed = self._get_max_allowed_gpus()
-            logging.debug(f"Dynamic reservation limit reached: using {current_used}/{max_allowed} GPUs, need {gpu_count} more")
+        if not self._can_acquire_more_gpus(gpu_count, snapshot):
+            # 统计数字只用于调试日志，未开启 DEBUG 时不计算
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Dynamic reservation limit reached: using %d/%d GPUs, need %d more",
+                              self._get_current_user_gpu_count(snapshot), self._get_max_allowed_gpus(snapshot), gpu_count)
             return None
         
         # 第一步：筛选出所有满足条件的GPU
@@ -311,27 +361,28 @@ class MultiGPUCompetitor:
             if not maximize_resource_utilization:
                 if gpu_id in self.occupied_gpus:
                     occupying_queue = self.occupied_gpus[gpu_id]
-                    logging.debug(f"GPU {gpu_id}: occupied by queue {occupying_queue} (internal)")
+                    logging.debug("GPU %d: occupied by queue %s (internal)", gpu_id, occupying_queue)
                     continue
             
             # 检查显存
-            available = GPUMonitor.get_available_memory(gpu_id)
+            gpu_info = snapshot.get(gpu_id, {})
+            available = gpu_info.get("free_gb", 0.0)
             if available < required_memory:
-                logging.debug(f"GPU {gpu_id}: insufficient memory ({available:.1f}GB < {required_memory}GB)")
+                logging.debug("GPU %d: insufficient memory (%.1fGB < %sGB)", gpu_id, available, required_memory)
                 continue
             
             # 非极限模式：检查外部用户进程
             if not maximize_resource_utilization:
-                user_procs = GPUMonitor.get_user_processes_on_gpu(gpu_id)
+                user_procs = gpu_info.get("user_pids")
                 if user_procs:
-                    logging.debug(f"GPU {gpu_id}: external user processes exist {user_procs}")
+                    logging.debug("GPU %d: external user processes exist %s", gpu_id, user_procs)
                     continue
             
             candidate_gpus.append(gpu_id)
         
         # 检查是否有足够的候选GPU
         if len(candidate_gpus) < gpu_count:
-            logging.debug(f"Only found {len(candidate_gpus)} GPUs, need {gpu_count}")
+            logging.debug("Only found %d GPUs, need %d", len(candidate_gpus), gpu_count)
             return None
         
         # 第二步：如果候选GPU数量刚好等于需求，直接返回
@@ -371,29 +422,27 @@ class MultiGPUCompetitor:
                 if gpu_id in self.occupied_gpus and self.occupied_gpus[gpu_id] == queue_id:
                     del self.occupied_gpus[gpu_id]
             logging.info(f"🔓 GPUs {gpu_ids} released by queue {queue_id}")
+            self.gpu_released.notify_all()
     
     def get_busy_queues(self) -> set:
         """获取当前正在运行任务的队列 ID 集合
         
-        直接检查任务状态
+        由 execute_task 维护的 running_tasks 索引直接给出，无需遍历全部任务
         """
-        busy = set()
-        for task in self.tasks:
-            if task.status == "running":
-                busy.add(task.queue_id)
-        return busy
+        return set(self.running_tasks)
     
-    def get_occupied_gpus(self) -> set:
-        """获取当前被占用的 GPU 集合（非极限模式下）"""
+    def get_occupied_gpus(self, snapshot: Optional[Dict[int, Dict]] = None) -> set:
+        """获取当前被占用的 GPU 集合（非极限模式下）
+        
+        Args:
+            snapshot: GPUMonitor.snapshot() 结果，未提供时重新查询；同一轮中与 find_available_gpu(s) 共用
+        """
         if maximize_resource_utilization:
             return set()
         
-        occupied = set()
-        for gpu_id in self.gpus:
-            user_procs = GPUMonitor.get_user_processes_on_gpu(gpu_id)
-            if user_procs:
-                occupied.add(gpu_id)
-        return occupied
+        if snapshot is None:
+            snapshot = GPUMonitor.snapshot()
+        return {gpu_id for gpu_id in self.gpus if snapshot.get(gpu_id, {}).get("user_pids")}
     
     def get_queue_head_task(self, queue_id: int) -> Optional[Task]:
         """获取队列的第一个 pending 任务"""
@@ -415,51 +464,74 @@ class MultiGPUCompetitor:
         """
         task.assigned_gpus = gpu_ids
         task.status = "running"
+        self.running_tasks[task.queue_id] = task
+        
+        # 命令输出直接写入队列日志文件（队内串行，同一文件不会交错），不在 Python 内存中缓冲
+        task_log_path = self._task_log_path(task.queue_id)
+        os.makedirs(os.path.dirname(task_log_path), exist_ok=True)
         
         # 构建 CUDA_VISIBLE_DEVICES 字符串
         cuda_devices = ','.join(map(str, gpu_ids))
         
         logging.info(f"🚀 Starting task (Queue {task.queue_id}, retry={task.retry_count}) on GPUs {gpu_ids}")
         
+        # 使用绝对路径初始化 conda，避免 HOME 环境变量问题
+        home_dir = os.path.expanduser('~')
+        conda_sh = f"{home_dir}/miniconda3/etc/profile.d/conda.sh"
+        
+        # 通过 env 传入 CUDA_VISIBLE_DEVICES（不拼接进命令字符串），并确保 HOME 被正确设置；
+        # 同一任务的所有命令共用这份环境
+        env = os.environ.copy()
+        env['HOME'] = home_dir
+        env['CUDA_VISIBLE_DEVICES'] = cuda_devices
+        
         for i, cmd_template in enumerate(task.commands):
             # 替换变量
-            cmd = cmd_template.format(work_dir=work_dir)
+            cmd = render_command(cmd_template)
             
-            # 在命令前添加 CUDA_VISIBLE_DEVICES 环境变量
-            # 使用绝对路径初始化 conda，避免 HOME 环境变量问题
-            home_dir = os.path.expanduser('~')
-            conda_sh = f"{home_dir}/miniconda3/etc/profile.d/conda.sh"
-            full_cmd = f"source {conda_sh} && export CUDA_VISIBLE_DEVICES={cuda_devices} && {cmd}"
+            full_cmd = f"source {conda_sh} && {cmd}"
             
             logging.info(f"   [{i+1}/{len(task.commands)}] [GPUs {cuda_devices}] {cmd[:80]}...")
             
             try:
-                # 确保 HOME 环境变量被正确设置
-                env = os.environ.copy()
-                env['HOME'] = home_dir
-                
-                result = subprocess.run(
-                    full_cmd,
-                    shell=True,
-                    executable='/bin/bash',
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=7200,  # 2小时超时
-                    env=env
-                )
-                
-                if result.returncode != 0:
-                    error_msg = result.stderr[:500] if result.stderr else "Unknown error"
-                    logging.error(f"   ❌ Command failed (exit code {result.returncode}): {error_msg}")
-                    # 触发重试机制
-                    self._handle_task_failure(task, f"exit_code_{result.returncode}")
-                    return False
+                # stderr 写入临时文件，仅失败时读取开头部分用于日志
+                with open(task_log_path, 'ab') as log_fh, tempfile.TemporaryFile() as err_fh:
+                    start_offset = log_fh.tell()
+                    proc = subprocess.Popen(
+                        full_cmd,
+                        shell=True,
+                        executable='/bin/bash',
+                        stdout=log_fh,
+                        stderr=err_fh,
+                        env=env
+                    )
+                    try:
+                        returncode = proc.wait(timeout=7200)  # 2小时超时
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                        proc.wait()
+                        raise
+                    
+                    if returncode != 0:
+                        err_fh.seek(0)
+                        error_msg = err_fh.read(2048).decode('utf-8', errors='replace')[:500] or "Unknown error"
+                        logging.error(f"   ❌ Command failed (exit code {returncode}): {error_msg}")
+                        # 触发重试机制
+                        self._handle_task_failure(task, f"exit_code_{returncode}")
+                        return False
                 
-                # 打印输出（简化）
-                if result.stdout.strip():
-                    for line in result.stdout.strip().split('\n')[:5]:
+                # 打印输出（简化）：从日志文件中读取本条命令输出的前 5 行
+                with open(task_log_path, 'rb') as log_fh:
+                    log_fh.seek(start_offset)
+                    printed = 0
+                    for raw_line in log_fh:
+                        line = raw_line.decode('utf-8', errors='replace').rstrip('\n')
+                        if printed == 0 and not line.strip():
+                            continue
                         logging.info(f"   > {line[:100]}")
+                        printed += 1
+                        if printed >= 5:
+                            break
                         
             except subprocess.TimeoutExpired:
                 logging.error(f"   ❌ Command timeout (2h)")
@@ -471,11 +543,13 @@ class MultiGPUCompetitor:
                 return False
         
         task.status = "completed"
+        self.running_tasks.pop(task.queue_id, None)
         logging.info(f"✅ Task (Queue {task.queue_id}) completed successfully")
         return True
     
     def _handle_task_failure(self, task: Task, error_type: str):
         """处理任务失败，应用重试机制"""
+        self.running_tasks.pop(task.queue_id, None)
         task.retry_count += 1
         task.error_type = error_type
         
@@ -496,23 +570,115 @@ class MultiGPUCompetitor:
     
     def print_status(self):
         """打印当前状态"""
-        pending = sum(1 for t in self.tasks if t.status == "pending")
-        running = sum(1 for t in self.tasks if t.status == "running")
-        completed = sum(1 for t in self.tasks if t.status == "completed")
-        failed = sum(1 for t in self.tasks if t.status == "failed")
+        # 每个任务只属于一个队列：按队列一次遍历统计各状态数量，总数由各队列累加
+        queue_counts = {qid: Counter(t.status for t in tasks) for qid, tasks in self.queues.items()}
+        totals = sum(queue_counts.values(), Counter())
         
         logging.info("=" * 60)
-        logging.info(f"📊 Tasks: Pending={pending}, Running={running}, Completed={completed}, Failed={failed}")
+        logging.info(
+            f"📊 Tasks: Pending={totals['pending']}, Running={totals['running']}, "
+            f"Completed={totals['completed']}, Failed={totals['failed']}"
+        )
         
         busy_queues = self.get_busy_queues()
         for qid in sorted(self.queues.keys()):
             status = "🔴 BUSY" if qid in busy_queues else "🟢 IDLE"
-            q_pending = sum(1 for t in self.queues[qid] if t.status == "pending")
-            q_completed = sum(1 for t in self.queues[qid] if t.status == "completed")
-            logging.info(f"   Queue {qid}: {status}, Pending={q_pending}, Completed={q_completed}")
+            counts = queue_counts[qid]
+            logging.info(f"   Queue {qid}: {status}, Pending={counts['pending']}, Completed={counts['completed']}")
         
         logging.info("=" * 60)
     
+    def _queue_priority(self, queue_id: int) -> Tuple[int, int]:
+        """队列提交顺序的排序键，越小越先提交
+        
+        队首未完成任务需要的 GPU 越多越靠前，相同则按队列 ID。
+        工作线程数少于队列数时，避免多卡任务一直排在单卡任务之后。
+        """
+        head = next((t for t in self.queues[queue_id] if t.status != "completed"), None)
+        return (-head.gpu_count if head else 0, queue_id)
+    
+    def _get_commands_mtime(self) -> int:
+        """命令文件修改时间（纳秒），文件不可访问时返回 0"""
+        try:
+            return os.stat(commands_path).st_mtime_ns
+        except OSError:
+            return 0
+    
+    @staticmethod
+    def _task_key(task: Task) -> tuple:
+        """热加载比较任务用的内容键 (queue_id, commands, gpu_count, memory)"""
+        return (task.queue_id, tuple(task.commands), task.gpu_count, task.estimated_memory_gb)
+    
+    def _reload_tasks_if_changed(self):
+        """命令文件修改后热加载新增任务（调用方需持有 _reload_lock）
+        
+        按内容比较：每个队列的任务视为 (queue_id, commands, gpu_count, memory) 的多重集合，
+        文件中多出的任务按文件中的顺序追加到队尾。
+        已完成的任务可以从文件中删除；未完成的任务被删除或修改时拒绝本次加载并给出警告。
+        新增的队列和已结束的队列需要重启调度器才会执行。
+        """
+        mtime = self._get_commands_mtime()
+        if mtime == self._commands_mtime:
+            return
+        self._commands_mtime = mtime
+        
+        parsed: Dict[int, List[Task]] = {}
+        for commands, queue_id, gpu_count, memory in parse_command_file(commands_path):
+            parsed.setdefault(queue_id, []).append(Task(
+                commands=commands,
+                queue_id=queue_id,
+                gpu_count=gpu_count,
+                estimated_memory_gb=memory
+            ))
+        
+        # 先检查所有队列，任何未完成的任务在文件中消失（被删除或修改）都拒绝整个加载
+        additions: Dict[int, List[Task]] = {}
+        for queue_id in set(parsed) | set(self.queues):
+            tasks = self.queues.get(queue_id, [])
+            remaining = Counter(self._task_key(task) for task in tasks)
+            new_tasks = []
+            for task in parsed.get(queue_id, []):
+                key = self._task_key(task)
+                if remaining[key] > 0:
+                    remaining[key] -= 1
+                else:
+                    new_tasks.append(task)
+            
+            # remaining 中剩下的是文件里已经没有的任务，只允许是已完成的任务（已结束的队列不再执行，不检查）
+            completed = Counter(self._task_key(task) for task in tasks if task.status == "completed")
+            if (queue_id not in self._closed_queues
+                    and any(count > completed[key] for key, count in remaining.items())):
+                logging.warning(f"⚠️ Queue {queue_id}: unfinished tasks were removed or changed in the command file, "
+                                f"reload refused; only appending new tasks is supported while the scheduler runs")
+                return
+            if new_tasks:
+                additions[queue_id] = new_tasks
+        
+        for queue_id, new_tasks in additions.items():
+            tasks = self.queues.get(queue_id)
+            if tasks is None or queue_id in self._closed_queues:
+                logging.warning(f"⚠️ Queue {queue_id}: {len(new_tasks)} new tasks in command file ignored, restart the scheduler to run them")
+                continue
+            
+            tasks.extend(new_tasks)
+            self.tasks.extend(new_tasks)
+            logging.info(f"📥 Queue {queue_id}: Loaded {len(new_tasks)} new tasks from command file")
+            if self.status_writer:
+                self.status_writer.append_queue_processes(queue_id, [
+                    {"commands": task.commands, "memory_gb": task.estimated_memory_gb, "gpu_count": task.gpu_count}
+                    for task in new_tasks
+                ])
+    
+    def _next_task(self, queue_id: int, task_idx: int) -> Optional[Task]:
+        """获取队列中的第 task_idx 个任务，没有时关闭队列并返回 None"""
+        with self._reload_lock:
+            self._reload_tasks_if_changed()
+            tasks = self.queues.get(queue_id, [])
+            if task_idx < len(tasks):
+                return tasks[task_idx]
+            self._closed_queues.add(queue_id)
+            return None
+    
     def _run_queue(self, queue_id: int):
         """运行单个队列的所有任务（队内串行）
         
@@ -522,7 +688,12 @@ class MultiGPUCompetitor:
         tasks = self.queues.get(queue_id, [])
         logging.info(f"🚀 Queue {queue_id}: Starting with {len(tasks)} tasks")
         
-        for task_idx, task in enumerate(tasks):
+        for task_idx in itertools.count():
+            # 每个任务开始前检查命令文件是否有新增任务，没有下一个任务时队列结束
+            task = self._next_task(queue_id, task_idx)
+            if task is None:
+                break
+            
             if not self.running:
                 logging.info(f"🛑 Queue {queue_id}: Scheduler stopped")
                 break
@@ -539,6 +710,9 @@ class MultiGPUCompetitor:
                 logging.error(f"❌ Queue {queue_id}: Task {task_idx+1}/{len(tasks)} failed after all retries, stopping queue")
                 break
         
+        with self._reload_lock:
+            self._closed_queues.add(queue_id)
+        
         # 队列完成
         completed = sum(1 for t in tasks if t.status == "completed")
         logging.info(f"🏁 Queue {queue_id}: Finished. Completed {completed}/{len(tasks)} tasks")
@@ -563,11 +737,11 @@ class MultiGPUCompetitor:
             if not self.running:
                 return False
             
-            # 检查退避
-            if task.backoff_until > 0 and time.time() < task.backoff_until:
-                wait_time = task.backoff_until - time.time()
+            # 检查退避：直接等到退避结束时间，停止时立即唤醒
+            wait_time = task.backoff_until - time.time()
+            if wait_time > 0:
                 logging.info(f"⏳ Queue {queue_id}: Task {task_idx+1}/{total_tasks} in backoff, waiting {wait_time:.0f}s")
-                time.sleep(min(wait_time, 60))  # 每次最多等60秒，然后重新检查
+                self._stop_event.wait(wait_time)
                 continue
             
             # 等待并获取可用 GPU（会立即标记为占用）
@@ -630,7 +804,7 @@ class MultiGPUCompetitor:
                         retry_count=task.retry_count,
                         last_error=task.error_type
                     )
-                time.sleep(5)  # 短暂等待后重试
+                self._stop_event.wait(5)  # 短暂等待后重试
             else:
                 # 任务状态不是 pending，说明不应该重试
                 # 更新状态：任务失败且不会重试
@@ -651,6 +825,13 @@ class MultiGPUCompetitor:
         logging.error(f"❌ Queue {queue_id}: Task {task_idx+1}/{total_tasks} exceeded max retries ({max_total_retries})")
         return False
     
+    def _has_unoccupied_gpus(self, gpu_count: int) -> bool:
+        """调度器内部未占用的 GPU 是否足够（只看内部状态，不查询 nvidia-smi）
+        
+        非极限模式下被调度器占用的 GPU 不会被选中，数量不足时无需探测；极限模式下总是返回 True
+        """
+        return maximize_resource_utilization or len(self.gpus) - len(self.occupied_gpus) >= gpu_count
+    
     def _wait_for_gpus(self, gpu_count: int, required_memory: int, queue_id: int, timeout: int = 3600) -> Optional[List[int]]:
         """等待可用的多个 GPU 并立即标记为占用
         
@@ -665,33 +846,39 @@ class MultiGPUCompetitor:
         """
         start_time = time.time()
         last_log_time = 0
+        snapshot = None  # 最近一次快照，跳过探测的轮次沿用它输出等待日志
         
         while time.time() - start_time < timeout:
             if not self.running:
                 return None
             
-            with self.gpu_lock:
-                gpu_ids = self.find_available_gpus(gpu_count, required_memory, queue_id)
-                if gpu_ids is not None:
-                    # 立即标记为占用，防止其他队列抢占
-                    for gpu_id in gpu_ids:
-                        self.occupied_gpus[gpu_id] = queue_id
-                    logging.info(f"🔒 GPUs {gpu_ids} acquired by queue {queue_id}")
-                    return gpu_ids
+            # 调度器内部占用后剩余的 GPU 已不够用时，任何快照都不可能满足，跳过本轮 nvidia-smi 查询
+            if self._has_unoccupied_gpus(gpu_count):
+                # 本轮查找和等待日志共用一次快照；nvidia-smi 查询放在锁外，不阻塞其他队列
+                snapshot = GPUMonitor.snapshot()
+                with self.gpu_lock:
+                    gpu_ids = self.find_available_gpus(gpu_count, required_memory, queue_id, snapshot)
+                    if gpu_ids is not None:
+                        # 立即标记为占用，防止其他队列抢占
+                        for gpu_id in gpu_ids:
+                            self.occupied_gpus[gpu_id] = queue_id
+                        logging.info(f"🔒 GPUs {gpu_ids} acquired by queue {queue_id}")
+                        return gpu_ids
             
             # 没有足够的可用 GPU，每check_time秒输出一次等待日志
             elapsed = time.time() - start_time
-            if time.time() - last_log_time >= check_time:
+            if snapshot is not None and time.time() - last_log_time >= check_time:
                 # 动态预留状态
-                current_used = self._get_current_user_gpu_count()
-                max_allowed = self._get_max_allowed_gpus()
+                current_used = self._get_current_user_gpu_count(snapshot)
+                max_allowed = self._get_max_allowed_gpus(snapshot)
                 
                 # 检查所有GPU的状态，输出详细信息
                 gpu_status = []
                 for gpu_id in self.gpus:
-                    available = GPUMonitor.get_available_memory(gpu_id)
+                    gpu_info = snapshot.get(gpu_id, {})
+                    available = gpu_info.get("free_gb", 0.0)
                     is_occupied = gpu_id in self.occupied_gpus
-                    user_procs = GPUMonitor.get_user_processes_on_gpu(gpu_id) if not maximize_resource_utilization else []
+                    user_procs = gpu_info.get("user_pids", []) if not maximize_resource_utilization else []
                     status = "🔴" if (is_occupied or user_procs) else "🟢"
                     gpu_status.append(f"GPU{gpu_id}: {status} ({available:.1f}GB)")
                 
@@ -701,14 +888,20 @@ class MultiGPUCompetitor:
                 )
                 last_log_time = time.time()
             
-            # 等待后重试
-            time.sleep(check_time)
+            # 等待后重试：有 GPU 被释放时提前唤醒，不必睡满 check_time
+            with self.gpu_released:
+                self.gpu_released.wait(check_time)
         
         logging.warning(f"⏰ Timeout waiting for {gpu_count} GPUs with {required_memory}GB memory each")
         return None
     
+    def _task_log_path(self, queue_id: int) -> str:
+        """队列日志文件路径（文件名包含模式和配置编号，多个调度器共用 log_dir 时互不干扰）"""
+        return os.path.join(log_dir, 'tasks', f'multi_{self.config_index}_queue{queue_id}.log')
+    
     def init_status_writer(self, config_index: int = 0):
         """初始化状态写入器"""
+        self.config_index = config_index
         status_dir = os.path.join(SCRIPT_DIR, 'logs', 'status')
         self.status_writer = StatusWriter(
             status_dir=status_dir,
@@ -739,6 +932,13 @@ class MultiGPUCompetitor:
         # 设置运行状态
         self.status_writer.set_state("running")
     
+    def _request_stop(self):
+        """停止调度：唤醒所有正在退避等待或等待GPU释放的队列线程"""
+        self.running = False
+        self._stop_event.set()
+        with self.gpu_released:
+            self.gpu_released.notify_all()
+    
     def run(self):
         """主调度循环（多GPU版本）
         
@@ -759,21 +959,26 @@ class MultiGPUCompetitor:
             logging.info(f"🔧 Starting {len(self.queues)} queues with {max_workers} workers")
             
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交所有队列任务
-                futures = {}
-                for queue_id in self.queues.keys():
-                    future = executor.submit(self._run_queue, queue_id)
-                    futures[future] = queue_id
-                    self.queue_futures[queue_id] = future
-                
-                # 等待所有队列完成
-                for future in concurrent.futures.as_completed(futures):
-                    queue_id = futures[future]
-                    try:
-                        future.result()
-                        logging.info(f"✅ Queue {queue_id} completed")
-                    except Exception as e:
-                        logging.error(f"❌ Queue {queue_id} failed with exception: {e}")
+                try:
+                    # 提交所有队列任务（多卡队列优先占用工作线程）
+                    futures = {}
+                    for queue_id in sorted(self.queues, key=self._queue_priority):
+                        future = executor.submit(self._run_queue, queue_id)
+                        futures[future] = queue_id
+                        self.queue_futures[queue_id] = future
+                    
+                    # 等待所有队列完成
+                    for future in concurrent.futures.as_completed(futures):
+                        queue_id = futures[future]
+                        try:
+                            future.result()
+                            logging.info(f"✅ Queue {queue_id} completed")
+                        except Exception as e:
+                            logging.error(f"❌ Queue {queue_id} failed with exception: {e}")
+                except KeyboardInterrupt:
+                    # 必须在线程池退出（等待所有工作线程结束）之前唤醒等待中的队列线程
+                    self._request_stop()
+                    raise
             
             # 打印最终状态
             self.print_status()
@@ -785,7 +990,7 @@ class MultiGPUCompetitor:
             
         except KeyboardInterrupt:
             logging.info("🛑 Received interrupt signal, stopping...")
-            self.running = False
+            self._request_stop()
             if self.status_writer:
                 self.status_writer.set_state("stopping")
         except Exception as e:
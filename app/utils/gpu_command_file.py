@@ -3,9 +3,16 @@ Command File Parser - 解析命令配置文件
 """
 
 import os
+import re
 import logging
 from typing import List, Tuple
 
+# 任务块分隔（空行，允许只含空白字符）与非空行匹配
+_BLOCK_RE = re.compile(r'\n\s*\n')
+_LINE_RE = re.compile(r'[^\n]+')
+# 行内数字：从第一个数字字符开始到下一个空白字符
+_NUMBER_RE = re.compile(r'\d\S*')
+
 
 def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int]]:
     """解析命令配置文件
@@ -34,12 +41,15 @@ def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int]]:
         content = f.read()
     
     # 按空行分割任务块
-    blocks = content.strip().split('\n\n')
-    
-    for block in blocks:
-        lines = [line.strip() for line in block.strip().split('\n')]
+    for block in _BLOCK_RE.split(content):
+        if not block:
+            continue
         # 过滤注释和空行
-        lines = [line for line in lines if line and not line.startswith('#')]
+        lines = []
+        for match in _LINE_RE.finditer(block):
+            line = match.group().strip()
+            if line and line[0] != '#':
+                lines.append(line)
         
         if len(lines) < 3:  # 至少需要：队列ID行 + 命令行 + 显存需求行
             continue
@@ -50,27 +60,11 @@ def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int]]:
         commands = lines[1:-1]
         
         try:
-            # 解析队列ID（读取所有字符串直到第一个数字）
-            queue_id_str = queue_id_line
-            # 找到第一个数字字符的位置
-            for i, char in enumerate(queue_id_str):
-                if char.isdigit():
-                    queue_id_str = queue_id_str[i:]
-                    break
-            # 移除数字后的注释（如果有的话）
-            queue_id_str = queue_id_str.split()[0]  # 只取第一个数字
-            queue_id = int(queue_id_str.strip())
+            # 解析队列ID
+            queue_id = _parse_number(queue_id_line)
             
-            # 解析显存需求（读取所有字符串直到第一个数字）
-            memory_str = memory_line
-            # 找到第一个数字字符的位置
-            for i, char in enumerate(memory_str):
-                if char.isdigit():
-                    memory_str = memory_str[i:]
-                    break
-            # 移除数字后的注释（如果有的话）
-            memory_str = memory_str.split()[0]  # 只取第一个数字
-            memory_gb = int(memory_str.strip())
+            # 解析显存需求
+            memory_gb = _parse_number(memory_line)
             
             tasks.append((commands, queue_id, memory_gb))
         except (ValueError, IndexError) as e:
@@ -79,4 +73,13 @@ def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int]]:
             logging.warning(f"  Memory line: {memory_line}")
             continue
     
-    return tasks
\ No newline at end of file
+    return tasks
+
+
+def _parse_number(line: str) -> int:
+    """从行中解析数字（支持数字前有前缀、数字后跟注释）"""
+    # 从第一个数字字符开始，取到下一个空白字符为止
+    match = _NUMBER_RE.search(line)
+    if match is None:
+        raise ValueError(f"no number in line: {line!r}")
+    return int(match.group())
\ No newline at end of file
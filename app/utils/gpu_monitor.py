@@ -5,49 +5,215 @@ GPU Monitor - 用于监控 GPU 状态
 import os
 import subprocess
 import logging
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 import psutil
 
+# 优先通过 pynvml 在进程内调用 NVML，未安装或初始化失败时回退到 nvidia-smi 子进程
+try:
+    import pynvml
+    PYNVML_AVAILABLE = True
+except ImportError:
+    PYNVML_AVAILABLE = False
+
 
 class GPUMonitor:
     """GPU 状态监控"""
     
+    # NVML 初始化状态：None 表示尚未尝试
+    _nvml_ready: Optional[bool] = None
+    _nvml_lock = threading.Lock()
+    # 设备句柄缓存（gpu_id -> handle）
+    _handles: Dict[int, Any] = {}
+    # 进程信息缓存（pid -> (create_time, username, name)），create_time 用于识别 PID 复用
+    _proc_cache: Dict[int, Tuple[float, str, str]] = {}
+    
+    @classmethod
+    def _nvml_init(cls) -> bool:
+        """初始化 NVML（只尝试一次），返回是否可用"""
+        if cls._nvml_ready is None:
+            with cls._nvml_lock:
+                if cls._nvml_ready is None:
+                    ready = False
+                    if PYNVML_AVAILABLE:
+                        try:
+                            pynvml.nvmlInit()
+                            ready = True
+                        except Exception as e:
+                            logging.debug("NVML init failed, falling back to nvidia-smi: %s", e)
+                    cls._nvml_ready = ready
+        return cls._nvml_ready
+    
+    @classmethod
+    def _get_handle(cls, gpu_id: int):
+        """获取缓存的 NVML 设备句柄"""
+        handle = cls._handles.get(gpu_id)
+        if handle is None:
+            handle = cls._handles[gpu_id] = pynvml.nvmlDeviceGetHandleByIndex(gpu_id)
+        return handle
+    
+    @classmethod
+    def snapshot(cls, with_processes: bool = True) -> Dict[int, Dict[str, Any]]:
+        """一次性获取所有 GPU 的可用显存和当前用户的 Python 进程
+        
+        优先在进程内查询 NVML；不可用时整轮只调用两次 nvidia-smi（显存一次、计算进程一次）
+        
+        Args:
+            with_processes: 是否查询进程（只需要显存时可跳过进程查询）
+        
+        Returns:
+            {gpu_id: {"free_gb": 可用显存 (GB), "user_pids": 当前用户的 Python 进程 PID 列表}}，
+            查询失败时返回空字典
+        """
+        if cls._nvml_init():
+            try:
+                return cls._snapshot_nvml(with_processes)
+            except Exception as e:
+                logging.debug("NVML query failed, falling back to nvidia-smi: %s", e)
+                cls._handles.clear()
+        return cls._snapshot_smi(with_processes)
+    
+    @classmethod
+    def _snapshot_nvml(cls, with_processes: bool) -> Dict[int, Dict[str, Any]]:
+        """通过 NVML 获取快照"""
+        snapshot = {}
+        current_user = os.getenv('USER', '')
+        seen_pids = set()
+        for gpu_id in range(pynvml.nvmlDeviceGetCount()):
+            handle = cls._get_handle(gpu_id)
+            user_pids = []
+            if with_processes:
+                for proc in pynvml.nvmlDeviceGetComputeRunningProcesses(handle):
+                    seen_pids.add(proc.pid)
+                    if cls._is_user_python_process(proc.pid, current_user):
+                        user_pids.append(proc.pid)
+            snapshot[gpu_id] = {
+                "free_gb": pynvml.nvmlDeviceGetMemoryInfo(handle).free / (1024 ** 3),
+                "user_pids": user_pids,
+            }
+        if with_processes:
+            cls._prune_proc_cache(seen_pids)
+        return snapshot
+    
     @staticmethod
-    def get_available_memory(gpu_id: int) -> float:
-        """获取指定 GPU 的可用显存 (GB)"""
+    def _spawn_smi(query: str) -> Optional[subprocess.Popen]:
+        """启动一个 nvidia-smi 查询子进程（不等待结束）"""
         try:
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=memory.free', '--format=csv,noheader,nounits', f'--id={gpu_id}'],
-                capture_output=True, text=True, timeout=10
+            return subprocess.Popen(
+                ['nvidia-smi', query, '--format=csv,noheader,nounits'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
             )
-            if result.returncode == 0:
-                return float(result.stdout.strip()) / 1024  # MB -> GB
         except Exception as e:
-            logging.debug(f"Failed to get memory for GPU {gpu_id}: {e}")
-        return 0.0
+            logging.debug("Failed to run nvidia-smi %s: %s", query, e)
+            return None
+    
+    @staticmethod
+    def _collect_smi(proc: Optional[subprocess.Popen]) -> Optional[str]:
+        """等待 nvidia-smi 子进程结束并返回输出，失败或超时返回 None"""
+        if proc is None:
+            return None
+        try:
+            stdout, _ = proc.communicate(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            logging.debug("nvidia-smi timed out")
+            return None
+        return stdout if proc.returncode == 0 else None
+    
+    @classmethod
+    def _snapshot_smi(cls, with_processes: bool) -> Dict[int, Dict[str, Any]]:
+        """通过 nvidia-smi 获取快照
+        
+        显存查询和进程查询两个子进程同时启动，总耗时约为一次 nvidia-smi 调用
+        """
+        mem_proc = cls._spawn_smi('--query-gpu=index,uuid,memory.free')
+        apps_proc = cls._spawn_smi('--query-compute-apps=gpu_uuid,pid') if with_processes else None
+        mem_output = cls._collect_smi(mem_proc)
+        apps_output = cls._collect_smi(apps_proc)
+        
+        snapshot = {}
+        uuid_to_index = {}
+        if mem_output is None:
+            return snapshot
+        for line in mem_output.strip().split('\n'):
+            parts = [x.strip() for x in line.split(',')]
+            if len(parts) != 3:
+                continue
+            try:
+                gpu_id = int(parts[0])
+                free_gb = float(parts[2]) / 1024  # MB -> GB
+            except ValueError:
+                continue
+            uuid_to_index[parts[1]] = gpu_id
+            snapshot[gpu_id] = {"free_gb": free_gb, "user_pids": []}
+        
+        if apps_output is None:
+            return snapshot
+        if not apps_output.strip():
+            cls._prune_proc_cache(())
+            return snapshot
+        
+        current_user = os.getenv('USER', '')
+        # 同一进程可能出现在多张 GPU 上，每个 PID 只检查一次
+        checked = {}
+        for line in apps_output.strip().split('\n'):
+            parts = [x.strip() for x in line.split(',')]
+            if len(parts) != 2 or parts[0] not in uuid_to_index:
+                continue
+            try:
+                pid = int(parts[1])
+            except ValueError:
+                continue
+            if pid not in checked:
+                checked[pid] = cls._is_user_python_process(pid, current_user)
+            if checked[pid]:
+                snapshot[uuid_to_index[parts[0]]]["user_pids"].append(pid)
+        cls._prune_proc_cache(checked.keys())
+        return snapshot
+    
+    @classmethod
+    def _get_proc_identity(cls, pid: int) -> Optional[Tuple[str, str]]:
+        """获取进程的 (username, name)，按 PID + 创建时间缓存；进程不存在或无权限时返回 None"""
+        try:
+            proc = psutil.Process(pid)
+            create_time = proc.create_time()
+            cached = cls._proc_cache.get(pid)
+            if cached is not None and cached[0] == create_time:
+                return cached[1], cached[2]
+            username, name = proc.username(), proc.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            cls._proc_cache.pop(pid, None)
+            return None
+        cls._proc_cache[pid] = (create_time, username, name)
+        return username, name
+    
+    @classmethod
+    def _prune_proc_cache(cls, seen_pids):
+        """清理已不在任何 GPU 上运行的进程缓存"""
+        seen_pids = set(seen_pids)
+        for pid in list(cls._proc_cache):
+            if pid not in seen_pids:
+                cls._proc_cache.pop(pid, None)
+    
+    @classmethod
+    def _is_user_python_process(cls, pid: int, current_user: str) -> bool:
+        """判断进程是否为当前用户的 Python 进程"""
+        identity = cls._get_proc_identity(pid)
+        if identity is None:
+            return False
+        username, name = identity
+        return username == current_user and 'python' in name.lower()
+    
+    @staticmethod
+    def get_available_memory(gpu_id: int) -> float:
+        """获取指定 GPU 的可用显存 (GB)"""
+        return GPUMonitor.snapshot(with_processes=False).get(gpu_id, {}).get("free_gb", 0.0)
     
     @staticmethod
     def get_user_processes_on_gpu(gpu_id: int) -> List[int]:
         """获取当前用户在指定 GPU 上的 Python 进程 PID 列表"""
-        pids = []
-        try:
-            result = subprocess.run(
-                ['nvidia-smi', '--query-compute-apps=pid', '--format=csv,noheader,nounits', f'--id={gpu_id}'],
-                capture_output=True, text=True, timeout=10
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                current_user = os.getenv('USER', '')
-                for line in result.stdout.strip().split('\n'):
-                    try:
-                        pid = int(line.strip())
-                        proc = psutil.Process(pid)
-                        if proc.username() == current_user and 'python' in proc.name().lower():
-                            pids.append(pid)
-                    except (ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-        except Exception as e:
-            logging.debug(f"Failed to get processes for GPU {gpu_id}: {e}")
-        return pids
+        return GPUMonitor.snapshot().get(gpu_id, {}).get("user_pids", [])
     
     @staticmethod
     def detect_gpus() -> List[int]:
@@ -59,7 +225,12 @@ class GPUMonitor:
                 return [int(x.strip()) for x in cuda_visible.split(',') if x.strip()]
             except ValueError:
                 pass
-        # 否则使用 nvidia-smi 探测
+        # 否则通过 NVML 或 nvidia-smi 探测
+        if GPUMonitor._nvml_init():
+            try:
+                return list(range(pynvml.nvmlDeviceGetCount()))
+            except Exception as e:
+                logging.debug("NVML device count failed, falling back to nvidia-smi: %s", e)
         try:
             result = subprocess.run(
                 ['nvidia-smi', '--query-gpu=index', '--format=csv,noheader'],
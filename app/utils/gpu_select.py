@@ -13,27 +13,143 @@ GPU Select - GPU 选择策略模块
 """
 
 import time
+import math
+import heapq
 import subprocess
 import logging
+import threading
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 
+from .gpu_monitor import GPUMonitor, PYNVML_AVAILABLE
+
+if PYNVML_AVAILABLE:
+    import pynvml
+
+
+# 采样查询字段（带 index，便于在一次输出中区分多个GPU）
+SAMPLE_QUERY_FIELDS = 'index,memory.free,memory.used,memory.total,utilization.gpu'
+
+# 采样窗口结束后额外等待 nvidia-smi 输出的时间（秒）
+SAMPLE_GRACE_SECONDS = 5.0
+
+# 采样提前结束：至少采样 SAMPLE_MIN_COUNT 次，且所有GPU各项指标的
+# 变异系数（标准差/均值）都低于 SAMPLE_STABLE_CV 时认为数据已稳定
+SAMPLE_MIN_COUNT = 5
+SAMPLE_STABLE_CV = 0.01
+
+# 批量查询被 nvidia-smi 整体拒绝时，逐个GPU并发查询的最大线程数
+SMI_QUERY_WORKERS = 8
+
+_BYTES_PER_GB = 1024 ** 3
+
+# 打分结果 (gpu_id, stats, 主优先级分数, 次优先级分数) 的排序键
+_SCORE_KEY = itemgetter(2, 3)
+
 
 @dataclass
 class GPUStats:
     """GPU 统计信息"""
+    # 采样时每次每个GPU都会创建一个实例，使用 __slots__ 去掉实例 __dict__
+    __slots__ = ('gpu_id', 'memory_free', 'memory_used', 'memory_total', 'utilization',
+                 'memory_utilization')
+    
     gpu_id: int
     memory_free: float      # 剩余显存 (GB)
     memory_used: float      # 已用显存 (GB)
     memory_total: float     # 总显存 (GB)
     utilization: float      # GPU 利用率 (0-100)
     
-    @property
-    def memory_utilization(self) -> float:
-        """显存利用率 (0-1)"""
-        if self.memory_total > 0:
-            return self.memory_used / self.memory_total
-        return 0.0
+    def __post_init__(self):
+        # 显存利用率 (0-1)，构造时计算一次
+        self.memory_utilization = self.memory_used / self.memory_total if self.memory_total > 0 else 0.0
+
+
+def _parse_sample_line(line: str) -> Optional[GPUStats]:
+    """解析一行 SAMPLE_QUERY_FIELDS 查询输出，格式错误返回 None"""
+    parts = line.split(',')
+    if len(parts) < 5:
+        return None
+    try:
+        return GPUStats(
+            gpu_id=int(parts[0]),
+            memory_free=float(parts[1]) / 1024,  # MB -> GB
+            memory_used=float(parts[2]) / 1024,  # MB -> GB
+            memory_total=float(parts[3]) / 1024,  # MB -> GB
+            utilization=float(parts[4])  # 0-100
+        )
+    except ValueError:
+        return None
+
+
+def _read_nvml_stats(gpu_id: int) -> GPUStats:
+    """通过 NVML 读取单个GPU的统计信息（复用 GPUMonitor 的初始化和句柄缓存）"""
+    handle = GPUMonitor._get_handle(gpu_id)
+    memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+    return GPUStats(
+        gpu_id=gpu_id,
+        memory_free=memory.free / _BYTES_PER_GB,
+        memory_used=memory.used / _BYTES_PER_GB,
+        memory_total=memory.total / _BYTES_PER_GB,
+        utilization=float(pynvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+    )
+
+
+class _RunningMean:
+    """单个GPU采样值的增量均值和方差（Welford 算法），只保存当前均值和平方差累加值"""
+    
+    __slots__ = ('n', 'memory_free', 'memory_used', 'memory_total', 'utilization',
+                 'm2_free', 'm2_used', 'm2_util')
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """清空已累加的采样"""
+        self.n = 0
+        self.memory_free = 0.0
+        self.memory_used = 0.0
+        self.memory_total = 0.0
+        self.utilization = 0.0
+        self.m2_free = 0.0
+        self.m2_used = 0.0
+        self.m2_util = 0.0
+    
+    def add(self, stats: GPUStats):
+        """累加一次采样"""
+        self.n += 1
+        n = self.n
+        delta = stats.memory_free - self.memory_free
+        self.memory_free += delta / n
+        self.m2_free += delta * (stats.memory_free - self.memory_free)
+        delta = stats.memory_used - self.memory_used
+        self.memory_used += delta / n
+        self.m2_used += delta * (stats.memory_used - self.memory_used)
+        self.memory_total = stats.memory_total  # 总显存不变
+        delta = stats.utilization - self.utilization
+        self.utilization += delta / n
+        self.m2_util += delta * (stats.utilization - self.utilization)
+    
+    def is_stable(self, min_samples: int, max_cv: float) -> bool:
+        """采样数达到 min_samples，且各项指标的标准差都不超过 max_cv * |均值|"""
+        if self.n < max(min_samples, 2):
+            return False
+        n1 = self.n - 1
+        return (math.sqrt(self.m2_free / n1) <= max_cv * abs(self.memory_free)
+                and math.sqrt(self.m2_used / n1) <= max_cv * abs(self.memory_used)
+                and math.sqrt(self.m2_util / n1) <= max_cv * abs(self.utilization))
+    
+    def to_stats(self, gpu_id: int) -> GPUStats:
+        """以当前均值构造 GPUStats"""
+        return GPUStats(
+            gpu_id=gpu_id,
+            memory_free=self.memory_free,
+            memory_used=self.memory_used,
+            memory_total=self.memory_total,
+            utilization=self.utilization
+        )
 
 
 class GPUSelector:
@@ -61,29 +177,11 @@ class GPUSelector:
         Returns:
             GPUStats 对象，失败返回 None
         """
-        try:
-            result = subprocess.run(
-                ['nvidia-smi', '--query-gpu=memory.free,memory.used,memory.total,utilization.gpu',
-                 '--format=csv,noheader,nounits', f'--id={gpu_id}'],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                parts = result.stdout.strip().split(',')
-                if len(parts) >= 4:
-                    return GPUStats(
-                        gpu_id=gpu_id,
-                        memory_free=float(parts[0].strip()) / 1024,  # MB -> GB
-                        memory_used=float(parts[1].strip()) / 1024,  # MB -> GB
-                        memory_total=float(parts[2].strip()) / 1024,  # MB -> GB
-                        utilization=float(parts[3].strip())  # 0-100
-                    )
-        except Exception as e:
-            logging.debug(f"Failed to get stats for GPU {gpu_id}: {e}")
-        return None
+        return GPUSelector.get_all_gpu_stats([gpu_id]).get(gpu_id)
     
     @staticmethod
     def get_all_gpu_stats(gpu_ids: List[int]) -> Dict[int, GPUStats]:
-        """获取多个GPU的统计信息
+        """获取多个GPU的统计信息（一次 nvidia-smi 调用查询全部GPU）
         
         Args:
             gpu_ids: GPU ID 列表
@@ -91,24 +189,70 @@ class GPUSelector:
         Returns:
             {gpu_id: GPUStats} 字典
         """
+        if not gpu_ids:
+            return {}
+        
+        if GPUMonitor._nvml_init():
+            try:
+                return {gpu_id: _read_nvml_stats(gpu_id) for gpu_id in gpu_ids}
+            except Exception as e:
+                logging.debug(f"NVML query failed, falling back to nvidia-smi: {e}")
+                GPUMonitor._handles.clear()
+        
+        stats = GPUSelector._query_smi(gpu_ids)
+        if stats is None and len(gpu_ids) > 1:
+            # 列表中有无效GPU等情况下 nvidia-smi 会整体报错，改为逐个GPU并发查询，
+            # 各次调用相互独立，总耗时约为一次 nvidia-smi 调用
+            logging.debug(f"Batched nvidia-smi query failed for GPUs {gpu_ids}, querying each GPU")
+            stats = {}
+            with ThreadPoolExecutor(max_workers=min(SMI_QUERY_WORKERS, len(gpu_ids))) as executor:
+                for gpu_stats in executor.map(lambda gpu_id: GPUSelector._query_smi([gpu_id]), gpu_ids):
+                    if gpu_stats:
+                        stats.update(gpu_stats)
+        return stats or {}
+    
+    @staticmethod
+    def _query_smi(gpu_ids: List[int]) -> Optional[Dict[int, GPUStats]]:
+        """一次 nvidia-smi 调用查询指定GPU
+        
+        Returns:
+            {gpu_id: GPUStats} 字典；nvidia-smi 返回非零状态码时返回 None
+        """
         stats = {}
-        for gpu_id in gpu_ids:
-            gpu_stats = GPUSelector.get_gpu_stats(gpu_id)
-            if gpu_stats:
-                stats[gpu_id] = gpu_stats
+        try:
+            result = subprocess.run(
+                ['nvidia-smi', '--query-gpu=' + SAMPLE_QUERY_FIELDS,
+                 '--format=csv,noheader,nounits',
+                 '--id=' + ','.join(str(gpu_id) for gpu_id in gpu_ids)],
+                capture_output=True, text=True, timeout=5
+            )
+            if result.returncode != 0:
+                return None
+            wanted = set(gpu_ids)
+            for line in result.stdout.splitlines():
+                gpu_stats = _parse_sample_line(line)
+                if gpu_stats is not None and gpu_stats.gpu_id in wanted:
+                    stats[gpu_stats.gpu_id] = gpu_stats
+        except Exception as e:
+            logging.debug(f"Failed to get stats for GPUs {gpu_ids}: {e}")
         return stats
     
     def sample_gpu_stats(self, gpu_ids: List[int], 
                          sample_count: int = 30, 
-                         sample_interval: float = 0.1) -> Dict[int, GPUStats]:
+                         sample_interval: float = 0.1,
+                         min_samples: int = SAMPLE_MIN_COUNT,
+                         stable_cv: float = SAMPLE_STABLE_CV) -> Dict[int, GPUStats]:
         """高频采样GPU统计信息并取平均值
         
-        在3秒内采样30次（每0.1秒采样一次），取平均值
+        在3秒内采样30次（每0.1秒采样一次），取平均值；
+        采样 min_samples 次后若所有GPU的数据都已稳定（变异系数低于 stable_cv）则提前结束
         
         Args:
             gpu_ids: GPU ID 列表
             sample_count: 采样次数，默认30次
             sample_interval: 采样间隔（秒），默认0.1秒
+            min_samples: 允许提前结束前的最少采样次数
+            stable_cv: 判定稳定的变异系数阈值
             
         Returns:
             {gpu_id: GPUStats} 字典，值为平均统计信息
@@ -116,42 +260,107 @@ class GPUSelector:
         if not gpu_ids:
             return {}
         
-        # 存储所有采样数据
-        samples: Dict[int, List[GPUStats]] = {gpu_id: [] for gpu_id in gpu_ids}
+        # 每个GPU只保存一份增量均值，不保存全部采样
+        samples: Dict[int, _RunningMean] = {gpu_id: _RunningMean() for gpu_id in gpu_ids}
         
         logging.info(f"🔍 开始GPU采样: {sample_count}次, 间隔{sample_interval}秒, 总时长{sample_count * sample_interval:.1f}秒")
         
-        for i in range(sample_count):
-            for gpu_id in gpu_ids:
-                stats = self.get_gpu_stats(gpu_id)
-                if stats:
-                    samples[gpu_id].append(stats)
-            
-            # 最后一次不需要等待
-            if i < sample_count - 1:
-                time.sleep(sample_interval)
+        # 优先在进程内轮询 NVML；不可用时读取一个 nvidia-smi -lms 常驻进程的输出
+        if not self._sample_nvml(samples, sample_count, sample_interval, min_samples, stable_cv):
+            self._sample_smi(samples, sample_count, sample_interval, min_samples, stable_cv)
         
-        # 计算平均值
+        # 取平均值
         avg_stats = {}
-        for gpu_id, stats_list in samples.items():
-            if not stats_list:
+        for gpu_id, mean in samples.items():
+            if not mean.n:
                 continue
             
-            n = len(stats_list)
-            avg_stats[gpu_id] = GPUStats(
-                gpu_id=gpu_id,
-                memory_free=sum(s.memory_free for s in stats_list) / n,
-                memory_used=sum(s.memory_used for s in stats_list) / n,
-                memory_total=stats_list[0].memory_total,  # 总显存不变
-                utilization=sum(s.utilization for s in stats_list) / n
-            )
+            stats = avg_stats[gpu_id] = mean.to_stats(gpu_id)
             
-            logging.debug(f"GPU {gpu_id} 平均值: free={avg_stats[gpu_id].memory_free:.2f}GB, "
-                         f"used={avg_stats[gpu_id].memory_used:.2f}GB, "
-                         f"util={avg_stats[gpu_id].utilization:.1f}%")
+            logging.debug("GPU %d 平均值: free=%.2fGB, used=%.2fGB, util=%.1f%%",
+                          gpu_id, stats.memory_free, stats.memory_used, stats.utilization)
         
         return avg_stats
     
+    @staticmethod
+    def _sample_nvml(samples: Dict[int, _RunningMean], sample_count: int, sample_interval: float,
+                     min_samples: int, stable_cv: float) -> bool:
+        """在进程内轮询 NVML 采样，结果累加到 samples
+        
+        Returns:
+            NVML 不可用或查询失败时返回 False（samples 已清空，由调用方回退到 nvidia-smi）
+        """
+        if not GPUMonitor._nvml_init():
+            return False
+        try:
+            for i in range(sample_count):
+                for gpu_id, mean in samples.items():
+                    mean.add(_read_nvml_stats(gpu_id))
+                if all(mean.is_stable(min_samples, stable_cv) for mean in samples.values()):
+                    logging.debug("GPU 数据已稳定，采样 %d 次后提前结束", i + 1)
+                    break
+                # 最后一次不需要等待
+                if i < sample_count - 1:
+                    time.sleep(sample_interval)
+            return True
+        except Exception as e:
+            logging.debug(f"NVML sampling failed, falling back to nvidia-smi: {e}")
+            GPUMonitor._handles.clear()
+            for mean in samples.values():
+                mean.reset()
+            return False
+    
+    @staticmethod
+    def _sample_smi(samples: Dict[int, _RunningMean], sample_count: int, sample_interval: float,
+                    min_samples: int, stable_cv: float):
+        """读取 nvidia-smi -lms 常驻进程的输出采样，结果累加到 samples
+        
+        一个进程按间隔持续输出所有GPU的数据，代替每次采样、每个GPU各 fork 一次 nvidia-smi
+        """
+        try:
+            proc = subprocess.Popen(
+                ['nvidia-smi', '--query-gpu=' + SAMPLE_QUERY_FIELDS,
+                 '--format=csv,noheader,nounits',
+                 '--id=' + ','.join(str(gpu_id) for gpu_id in samples),
+                 '-lms', str(max(1, int(sample_interval * 1000)))],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+            )
+        except Exception as e:
+            logging.debug(f"Failed to start nvidia-smi sampling: {e}")
+            return
+        
+        # nvidia-smi 卡住时 readline 会一直阻塞，超过采样窗口后由定时器强制结束进程
+        duration = sample_count * sample_interval
+        watchdog = threading.Timer(duration + SAMPLE_GRACE_SECONDS, proc.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        
+        # 采样窗口从收到第一行输出开始计时，nvidia-smi 启动和 NVML 初始化的耗时
+        # （未开启持久模式时可达秒级）不占用采样时间
+        deadline = None
+        pending = len(samples)  # 尚未采满 sample_count 次的GPU数量
+        try:
+            for line in proc.stdout:
+                if deadline is None:
+                    deadline = time.monotonic() + duration
+                stats = _parse_sample_line(line)
+                mean = samples.get(stats.gpu_id) if stats is not None else None
+                if mean is not None:
+                    mean.add(stats)
+                    if mean.n == sample_count:
+                        pending -= 1
+                    elif (mean.n >= min_samples
+                          and all(m.is_stable(min_samples, stable_cv) for m in samples.values())):
+                        logging.debug("GPU 数据已稳定，采样 %d 次后提前结束", mean.n)
+                        break
+                if pending <= 0 or time.monotonic() >= deadline:
+                    break
+        finally:
+            watchdog.cancel()
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+    
     def calculate_priority(self, stats: GPUStats) -> Tuple[float, float]:
         """计算GPU优先级分数
         
@@ -178,6 +387,36 @@ class GPUSelector:
         
         return (primary_score, secondary_score)
     
+    def _score_candidates(self, gpu_ids: List[int], required_memory: float, use_sampling: bool,
+                          sample_count: int, sample_interval: float) -> List[Tuple[int, GPUStats, float, float]]:
+        """获取GPU统计信息，一次遍历完成显存过滤和优先级打分
+        
+        Returns:
+            [(gpu_id, stats, 主优先级分数, 次优先级分数)]，未排序；没有可用GPU时返回空列表
+        """
+        # 获取GPU统计信息
+        if use_sampling:
+            stats_dict = self.sample_gpu_stats(gpu_ids, sample_count, sample_interval)
+        else:
+            stats_dict = self.get_all_gpu_stats(gpu_ids)
+        
+        if not stats_dict:
+            logging.warning("无法获取任何GPU的统计信息")
+            return []
+        
+        # 过滤显存不足的GPU，同时计算优先级
+        scored_gpus = []
+        for gpu_id, stats in stats_dict.items():
+            if stats.memory_free < required_memory:
+                logging.debug("GPU %d 显存不足: %.2fGB < %sGB", gpu_id, stats.memory_free, required_memory)
+                continue
+            primary, secondary = self.calculate_priority(stats)
+            scored_gpus.append((gpu_id, stats, primary, secondary))
+        
+        if not scored_gpus:
+            logging.warning(f"没有GPU满足显存需求 {required_memory}GB")
+        return scored_gpus
+    
     def select_best_gpu(self, gpu_ids: List[int], 
                         required_memory: float = 0,
                         use_sampling: bool = True,
@@ -198,45 +437,21 @@ class GPUSelector:
         if not gpu_ids:
             return None
         
-        # 获取GPU统计信息
-        if use_sampling:
-            stats_dict = self.sample_gpu_stats(gpu_ids, sample_count, sample_interval)
-        else:
-            stats_dict = self.get_all_gpu_stats(gpu_ids)
-        
-        if not stats_dict:
-            logging.warning("无法获取任何GPU的统计信息")
+        scored_gpus = self._score_candidates(gpu_ids, required_memory, use_sampling, sample_count, sample_interval)
+        if not scored_gpus:
             return None
         
-        # 过滤显存不足的GPU
-        valid_gpus = []
-        for gpu_id, stats in stats_dict.items():
-            if stats.memory_free >= required_memory:
-                valid_gpus.append((gpu_id, stats))
-            else:
-                logging.debug(f"GPU {gpu_id} 显存不足: {stats.memory_free:.2f}GB < {required_memory}GB")
-        
-        if not valid_gpus:
-            logging.warning(f"没有GPU满足显存需求 {required_memory}GB")
-            return None
-        
-        # 计算优先级并排序
-        scored_gpus = []
-        for gpu_id, stats in valid_gpus:
-            primary, secondary = self.calculate_priority(stats)
-            scored_gpus.append((gpu_id, stats, primary, secondary))
-            
+        # 逐个GPU的打分明细只在 INFO 级别开启时才格式化
+        if logging.getLogger().isEnabledFor(logging.INFO):
             mode_name = "节省显存" if self.memory_save_mode else "防止溢出"
-            logging.info(f"GPU {gpu_id} [{mode_name}模式]: "
-                        f"free={stats.memory_free:.2f}GB, used={stats.memory_used:.2f}GB, "
-                        f"util={stats.utilization:.1f}%, mem_util={stats.memory_utilization:.2%}, "
-                        f"score=({primary:.4f}, {secondary:.4f})")
-        
-        # 按优先级排序（分数越小越优先）
-        scored_gpus.sort(key=lambda x: (x[2], x[3]))
+            for gpu_id, stats, primary, secondary in scored_gpus:
+                logging.info("GPU %d [%s模式]: free=%.2fGB, used=%.2fGB, util=%.1f%%, "
+                             "mem_util=%.2f%%, score=(%.4f, %.4f)",
+                             gpu_id, mode_name, stats.memory_free, stats.memory_used, stats.utilization,
+                             stats.memory_utilization * 100, primary, secondary)
         
-        best_gpu_id = scored_gpus[0][0]
-        best_stats = scored_gpus[0][1]
+        # 只需要分数最小的一个，无需整体排序
+        best_gpu_id, best_stats, _, _ = min(scored_gpus, key=_SCORE_KEY)
         
         logging.info(f"✅ 选择GPU {best_gpu_id}: free={best_stats.memory_free:.2f}GB, "
                     f"util={best_stats.utilization:.1f}%")
@@ -265,39 +480,16 @@ class GPUSelector:
         if not gpu_ids or count <= 0:
             return []
         
-        # 获取GPU统计信息
-        if use_sampling:
-            stats_dict = self.sample_gpu_stats(gpu_ids, sample_count, sample_interval)
-        else:
-            stats_dict = self.get_all_gpu_stats(gpu_ids)
-        
-        if not stats_dict:
-            logging.warning("无法获取任何GPU的统计信息")
-            return []
-        
-        # 过滤显存不足的GPU
-        valid_gpus = []
-        for gpu_id, stats in stats_dict.items():
-            if stats.memory_free >= required_memory:
-                valid_gpus.append((gpu_id, stats))
-            else:
-                logging.debug(f"GPU {gpu_id} 显存不足: {stats.memory_free:.2f}GB < {required_memory}GB")
-        
-        if not valid_gpus:
-            logging.warning(f"没有GPU满足显存需求 {required_memory}GB")
+        scored_gpus = self._score_candidates(gpu_ids, required_memory, use_sampling, sample_count, sample_interval)
+        if not scored_gpus:
             return []
         
-        # 计算优先级并排序
-        scored_gpus = []
-        for gpu_id, stats in valid_gpus:
-            primary, secondary = self.calculate_priority(stats)
-            scored_gpus.append((gpu_id, stats, primary, secondary))
-        
-        # 按优先级排序（分数越小越优先）
-        scored_gpus.sort(key=lambda x: (x[2], x[3]))
-        
-        # 选择前count个GPU
-        selected = [gpu_id for gpu_id, _, _, _ in scored_gpus[:count]]
+        # 选择分数最小的前count个GPU（分数越小越优先）：候选数多于 count 时用堆取前 count 个，否则直接排序
+        if count < len(scored_gpus):
+            scored_gpus = heapq.nsmallest(count, scored_gpus, key=_SCORE_KEY)
+        else:
+            scored_gpus.sort(key=_SCORE_KEY)
+        selected = [gpu_id for gpu_id, _, _, _ in scored_gpus]
         
         if selected:
             logging.info(f"✅ 选择 {len(selected)} 个GPU: {selected}")
@@ -3,9 +3,16 @@ Command File Parser - 解析多GPU命令配置文件
 """
 
 import os
+import re
 import logging
 from typing import List, Tuple
 
+# 任务块分隔（空行，允许只含空白字符）与非空行匹配
+_BLOCK_RE = re.compile(r'\n\s*\n')
+_LINE_RE = re.compile(r'[^\n]+')
+# 行内数字：从第一个数字字符开始到下一个空白字符
+_NUMBER_RE = re.compile(r'\d\S*')
+
 
 def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int, int]]:
     """解析多GPU命令配置文件
@@ -35,12 +42,15 @@ def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int, int]]:
         content = f.read()
     
     # 按空行分割任务块
-    blocks = content.strip().split('\n\n')
-    
-    for block in blocks:
-        lines = [line.strip() for line in block.strip().split('\n')]
+    for block in _BLOCK_RE.split(content):
+        if not block:
+            continue
         # 过滤注释和空行
-        lines = [line for line in lines if line and not line.startswith('#')]
+        lines = []
+        for match in _LINE_RE.finditer(block):
+            line = match.group().strip()
+            if line and line[0] != '#':
+                lines.append(line)
         
         if len(lines) < 4:  # 至少需要：队列ID行 + 命令行 + GPU数量行 + 显存需求行
             continue
@@ -74,12 +84,9 @@ def parse_command_file(file_path: str) -> List[Tuple[List[str], int, int, int]]:
 
 
 def _parse_number(line: str) -> int:
-    """从行中解析数字（支持数字后跟注释）"""
-    # 找到第一个数字字符的位置
-    for i, char in enumerate(line):
-        if char.isdigit():
-            line = line[i:]
-            break
-    # 移除数字后的注释（如果有的话）
-    line = line.split()[0]  # 只取第一个数字
-    return int(line.strip())
+    """从行中解析数字（支持数字前有前缀、数字后跟注释）"""
+    # 从第一个数字字符开始，取到下一个空白字符为止
+    match = _NUMBER_RE.search(line)
+    if match is None:
+        raise ValueError(f"no number in line: {line!r}")
+    return int(match.group())
@@ -5,17 +5,60 @@ Process JSON - 用于管理 uni_id.json 文件
 import os
 import json
 import logging
-from typing import Dict, Optional
+import tempfile
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Set, Tuple
 import psutil
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 存活进程集合缓存有效期（秒）
+PID_CACHE_TTL = 0.5
+
 
 class ProcessJSON:
-    """管理 uni_id.json 文件"""
+    """管理 uni_id.json 文件
+    
+    连续修改多条记录时可使用批量模式，只读取和写入一次文件：
+    
+        with process_json:
+            process_json.update_record(...)
+            process_json.increment_retry(...)
+    """
+    
+    # 存活进程集合缓存 (刷新时间, pid 集合)，所有实例共用；一批检查只需列举一次 /proc
+    _pid_cache: Tuple[float, FrozenSet[int]] = (0.0, frozenset())
     
     def __init__(self, json_path: str):
         self.json_path = json_path
+        # 批量修改：嵌套 with 只在最外层读取一次、退出时写入一次
+        self._lock = threading.RLock()
+        self._batch: Optional[dict] = None
+        self._batch_depth = 0
+        self._batch_dirty = False  # 批量期间是否有修改，没有修改时退出不写文件
+        # 解析结果缓存：文件 (mtime_ns, size) 未变化时直接返回，不重复读取和解析
+        self._cache: dict = {}
+        self._cache_key: Optional[Tuple[int, int]] = None
         self._ensure_exists()
     
+    def _file_key(self) -> Optional[Tuple[int, int]]:
+        """文件的 (mtime_ns, size)，无法访问时返回 None"""
+        try:
+            st = os.stat(self.json_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    @staticmethod
+    def _copy(data: dict) -> dict:
+        """复制全部记录（逐条记录浅拷贝）"""
+        return {k: dict(v) if isinstance(v, dict) else v for k, v in data.items()}
+    
     def _ensure_exists(self):
         """确保 JSON 文件存在"""
         os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
@@ -24,65 +67,147 @@ class ProcessJSON:
                 json.dump({}, f)
     
     def load(self) -> dict:
-        """安全加载 JSON"""
-        try:
-            with open(self.json_path, 'r') as f:
-                content = f.read().strip()
-                if not content:
+        """安全加载 JSON（文件未变化时不重新解析；返回缓存的副本，调用方可以随意修改）"""
+        with self._lock:
+            key = self._file_key()
+            if key is None or key != self._cache_key:
+                try:
+                    with open(self.json_path, 'rb') as f:
+                        content = f.read().strip()
+                    if not content:
+                        data = {}
+                    else:
+                        data = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+                        if not isinstance(data, dict):
+                            data = {}
+                except Exception as e:
+                    logging.warning(f"Failed to load JSON: {e}")
                     return {}
-                data = json.loads(content)
-                return data if isinstance(data, dict) else {}
-        except Exception as e:
-            logging.warning(f"Failed to load JSON: {e}")
-            return {}
+                self._cache, self._cache_key = data, key
+            return self._copy(self._cache)
     
     def save(self, data: dict):
-        """安全保存 JSON"""
+        """安全保存 JSON（先写临时文件再 os.replace，读取方不会看到半写入的内容）"""
+        tmp_path = None
         try:
-            with open(self.json_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            # 每次写入使用独立的临时文件，多个线程或实例同时保存时互不覆盖
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f"{os.path.basename(self.json_path)}.", suffix='.tmp',
+                dir=os.path.dirname(self.json_path) or '.')
+            if ORJSON_AVAILABLE:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=2)
+            os.chmod(tmp_path, 0o644)  # mkstemp 创建的文件权限为 0600
+            os.replace(tmp_path, self.json_path)
         except Exception as e:
             logging.error(f"Failed to save JSON: {e}")
+            self._cache_key = None  # 写入失败，缓存可能与文件不一致
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        # 缓存保存一份副本，调用方之后继续修改 data 不会影响缓存
+        self._cache, self._cache_key = self._copy(data), self._file_key()
+    
+    def __enter__(self) -> "ProcessJSON":
+        """进入批量修改：加锁并读取一次数据（在副本上修改，保存成功后才替换缓存）"""
+        self._lock.acquire()
+        if self._batch_depth == 0:
+            self._batch = self.load()
+            self._batch_dirty = False
+        self._batch_depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """退出批量修改：最外层退出时写入一次（已应用的修改即使出现异常也会写入，写入失败时缓存保持原样；没有修改时不写入）"""
+        try:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                data, self._batch = self._batch, None
+                if self._batch_dirty:
+                    self.save(data)
+        finally:
+            self._lock.release()
+        return False
+    
+    def snapshot(self) -> dict:
+        """读取一次文件，返回全部记录的副本（同 load）
+        
+        同一轮调度中的多次查询可共用这份快照（传给 data 参数），避免重复读取和复制
+        """
+        return self.load()
     
-    def get_record(self, uni_id: str) -> Optional[dict]:
-        """获取指定 uni_id 的记录"""
-        data = self.load()
+    def get_record(self, uni_id: str, data: Optional[dict] = None) -> Optional[dict]:
+        """获取指定 uni_id 的记录（data 为预先读取的快照，None 时读取文件）"""
+        if data is None:
+            data = self.load()
         return data.get(uni_id)
     
     def update_record(self, uni_id: str, pid: int, state: str, error_type: str = None):
-        """更新记录"""
-        data = self.load()
-        if uni_id not in data:
-            data[uni_id] = {'retry_count': 0}
-        data[uni_id]['pid'] = pid
-        data[uni_id]['state'] = state
-        if error_type:
-            data[uni_id]['error_type'] = error_type
-        elif state == 'normal_exit' and 'error_type' in data[uni_id]:
-            del data[uni_id]['error_type']
-        self.save(data)
+        """更新记录（批量模式下只修改内存中的数据）"""
+        with self:
+            data = self._batch
+            if uni_id not in data:
+                data[uni_id] = {'retry_count': 0}
+            self._batch_dirty = True
+            data[uni_id]['pid'] = pid
+            data[uni_id]['state'] = state
+            if error_type:
+                data[uni_id]['error_type'] = error_type
+            elif state == 'normal_exit' and 'error_type' in data[uni_id]:
+                del data[uni_id]['error_type']
     
     def increment_retry(self, uni_id: str) -> int:
-        """增加重试次数并返回新值"""
-        data = self.load()
-        if uni_id in data:
-            data[uni_id]['retry_count'] = data[uni_id].get('retry_count', 0) + 1
-            self.save(data)
-            return data[uni_id]['retry_count']
-        return 0
-    
-    def get_running_processes(self) -> Dict[str, dict]:
-        """获取所有 running 状态的进程"""
-        data = self.load()
+        """增加重试次数并返回新值（批量模式下只修改内存中的数据）"""
+        with self:
+            data = self._batch
+            if uni_id in data:
+                self._batch_dirty = True
+                data[uni_id]['retry_count'] = data[uni_id].get('retry_count', 0) + 1
+                return data[uni_id]['retry_count']
+            return 0
+    
+    def get_running_processes(self, data: Optional[dict] = None) -> Dict[str, dict]:
+        """获取所有 running 状态的进程（data 为预先读取的快照，None 时读取文件）"""
+        if data is None:
+            data = self.load()
         return {k: v for k, v in data.items() 
                 if isinstance(v, dict) and v.get('state') == 'running'}
     
-    def is_process_running(self, uni_id: str) -> bool:
-        """检查进程是否真正在运行"""
-        record = self.get_record(uni_id)
+    def is_process_running(self, uni_id: str, data: Optional[dict] = None,
+                           live_pids: Optional[Set[int]] = None) -> bool:
+        """检查进程是否真正在运行
+        
+        Args:
+            uni_id: 记录 ID
+            data: 预先读取的快照，None 时读取文件
+            live_pids: 调用方本轮已获取的存活进程集合，命中时直接返回；
+                未命中时仍回退到 psutil 确认（集合可能不完整）
+        """
+        record = self.get_record(uni_id, data)
         if not record or record.get('state') != 'running':
             return False
         pid = record.get('pid', 0)
         if pid <= 0:
             return False
-        return psutil.pid_exists(pid)
\ No newline at end of file
+        if live_pids is not None and pid in live_pids:
+            return True
+        if pid in self._live_pids():
+            return True
+        # 缓存中没有时再精确确认一次（进程可能在缓存刷新后才启动）
+        return psutil.pid_exists(pid)
+    
+    @classmethod
+    def _live_pids(cls) -> FrozenSet[int]:
+        """获取存活进程集合（缓存 PID_CACHE_TTL 秒）"""
+        checked_at, pids = cls._pid_cache
+        now = time.monotonic()
+        if now - checked_at > PID_CACHE_TTL:
+            pids = frozenset(psutil.pids())
+            cls._pid_cache = (now, pids)
+        return pids
\ No newline at end of file
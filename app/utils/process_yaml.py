@@ -6,7 +6,7 @@ import os
 import logging
 import yaml
 import argparse
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 
 class ProcessYAML:
@@ -20,6 +20,51 @@ class ProcessYAML:
         """
         self.file_path = file_path
         self._config = None
+        self._mtime: Optional[int] = None
+        self._key_cache: Dict[str, Tuple[str, ...]] = {}
+        self._flat: Dict[str, Any] = {}
+        # update() 写入的内存覆盖项（按写入顺序），文件变化重新加载后再次应用
+        self._overrides: Dict[str, Any] = {}
+    
+    def _get_mtime(self) -> Optional[int]:
+        """配置文件的 mtime_ns，无法访问时返回 None"""
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _ensure_loaded(self):
+        """首次访问或文件被修改后重新加载配置"""
+        if self._config is None or self._get_mtime() != self._mtime:
+            self.load()
+    
+    def _split_key(self, key: str) -> Tuple[str, ...]:
+        """拆分点号分隔的配置键（结果缓存）"""
+        keys = self._key_cache.get(key)
+        if keys is None:
+            keys = self._key_cache[key] = tuple(key.split('.'))
+        return keys
+    
+    @staticmethod
+    def _flatten(data: Dict[str, Any], prefix: str = '', flat: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """将嵌套配置展开为点号分隔键的查找表（中间层字典同样保留）
+        
+        Args:
+            data: 嵌套配置字典
+            prefix: 键前缀
+            flat: 写入的查找表，为 None 时新建
+            
+        Returns:
+            {'retry_config.max_retry_before_backoff': 3, 'retry_config': {...}, ...}
+        """
+        if flat is None:
+            flat = {}
+        for k, v in data.items():
+            flat_key = f"{prefix}{k}"
+            flat[flat_key] = v
+            if isinstance(v, dict):
+                ProcessYAML._flatten(v, f"{flat_key}.", flat)
+        return flat
     
     def load(self) -> Dict[str, Any]:
         """加载 YAML 配置文件
@@ -31,11 +76,16 @@ class ProcessYAML:
             logging.error(f"Config file not found: {self.file_path}")
             return {}
         
+        mtime = self._get_mtime()
         try:
             with open(self.file_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f) or {}
             
             self._config = config
+            self._flat = self._flatten(config) if isinstance(config, dict) else {}
+            self._mtime = mtime
+            for key, value in self._overrides.items():
+                self._apply(key, value)
             logging.info(f"✅ Loaded config from {self.file_path}")
             return config
             
@@ -56,18 +106,8 @@ class ProcessYAML:
         Returns:
             配置值
         """
-        if self._config is None:
-            self.load()
-        
-        keys = key.split('.')
-        value = self._config
-        
-        try:
-            for k in keys:
-                value = value[k]
-            return value
-        except (KeyError, TypeError):
-            return default
+        self._ensure_loaded()
+        return self._flat.get(key, default)
     
     def get_int(self, key: str, default: int = 0) -> int:
         """获取整数配置项
@@ -85,18 +125,23 @@ class ProcessYAML:
         except (ValueError, TypeError):
             return default
     
-    def get_config(self) -> Dict[str, Any]:
+    def get_config(self, copy: bool = True) -> Dict[str, Any]:
         """获取完整配置
         
+        Args:
+            copy: 是否返回副本；只读且频繁调用的场景可传 False 直接使用缓存的配置字典
+                （调用方不得修改，且文件变化重新加载后不会随之更新）
+        
         Returns:
             完整配置字典
         """
-        if self._config is None:
-            self.load()
-        return self._config.copy() if self._config else {}
+        self._ensure_loaded()
+        if not self._config:
+            return {}
+        return self._config.copy() if copy else self._config
     
     def update(self, key: str, value: Any) -> bool:
-        """更新配置项（仅内存中，不保存到文件）
+        """更新配置项（仅内存中，不保存到文件；配置文件变化重新加载后仍然保留）
         
         Args:
             key: 配置键
@@ -105,19 +150,36 @@ class ProcessYAML:
         Returns:
             是否成功
         """
-        if self._config is None:
-            self.load()
-        
-        keys = key.split('.')
+        self._ensure_loaded()
+        if not self._apply(key, value):
+            return False
+        # 新值覆盖整个子树：移除该键及其子键的旧覆盖项，再按写入顺序追加
+        prefix = f"{key}."
+        for override_key in [k for k in self._overrides if k == key or k.startswith(prefix)]:
+            del self._overrides[override_key]
+        self._overrides[key] = value
+        return True
+    
+    def _apply(self, key: str, value: Any) -> bool:
+        """将配置项写入内存中的配置和查找表"""
+        keys = self._split_key(key)
         config = self._config
         
         try:
-            for k in keys[:-1]:
+            for i, k in enumerate(keys[:-1]):
                 if k not in config:
                     config[k] = {}
+                    self._flat['.'.join(keys[:i + 1])] = config[k]
                 config = config[k]
             
             config[keys[-1]] = value
+            # 同步查找表：移除旧的子键，再写入新值及其子键
+            prefix = f"{key}."
+            for flat_key in [fk for fk in self._flat if fk.startswith(prefix)]:
+                del self._flat[flat_key]
+            self._flat[key] = value
+            if isinstance(value, dict):
+                self._flatten(value, prefix, self._flat)
             return True
         except Exception as e:
             logging.error(f"Failed to update config {key}: {e}")
@@ -194,6 +194,23 @@ class StatusWriter:
             }
         self._save()
     
+    @staticmethod
+    def _new_process_entry(idx: int, proc: dict) -> dict:
+        """构造一条初始状态的进程记录"""
+        return {
+            "index": idx,
+            "commands": proc.get("commands", []),
+            "memory_gb": proc.get("memory_gb", 0),
+            "gpu_count": proc.get("gpu_count", 1),
+            "status": "pending",  # pending | running | completed | failed | retrying
+            "current_gpu": None,
+            "gpus": [],  # 多GPU模式下使用的GPU列表
+            "retry_count": 0,
+            "last_error": None,
+            "started_at": None,
+            "finished_at": None
+        }
+    
     def init_queue_processes(self, queue_id: int, processes: list):
         """初始化队列的进程列表
         
@@ -204,25 +221,33 @@ class StatusWriter:
         if queue_id not in self.status.queues:
             return
         
-        proc_list = []
-        for idx, proc in enumerate(processes):
-            proc_list.append({
-                "index": idx,
-                "commands": proc.get("commands", []),
-                "memory_gb": proc.get("memory_gb", 0),
-                "gpu_count": proc.get("gpu_count", 1),
-                "status": "pending",  # pending | running | completed | failed | retrying
-                "current_gpu": None,
-                "gpus": [],  # 多GPU模式下使用的GPU列表
-                "retry_count": 0,
-                "last_error": None,
-                "started_at": None,
-                "finished_at": None
-            })
+        proc_list = [self._new_process_entry(idx, proc) for idx, proc in enumerate(processes)]
         
         self.status.queues[queue_id]["processes"] = proc_list
         self._save()
     
+    def append_queue_processes(self, queue_id: int, processes: list):
+        """向队列追加进程（命令文件热加载新增的任务）
+        
+        Args:
+            queue_id: 队列 ID
+            processes: 进程信息列表 [{commands, memory_gb, gpu_count(optional)}]
+        """
+        if queue_id not in self.status.queues or not processes:
+            return
+        
+        q = self.status.queues[queue_id]
+        proc_list = q.setdefault("processes", [])
+        start = len(proc_list)
+        for idx, proc in enumerate(processes, start):
+            proc_list.append(self._new_process_entry(idx, proc))
+        
+        q["total_tasks"] = q.get("total_tasks", 0) + len(processes)
+        q["pending_tasks"] = q.get("pending_tasks", 0) + len(processes)
+        self.status.total_tasks += len(processes)
+        self._recalculate_totals()
+        self._save()
+    
     def update_process_status(self, queue_id: int, process_idx: int, 
                               status: str = None,
                               current_gpu: int = None,
@@ -10,14 +10,68 @@
 - ...
 """
 
+import io
+import copy
 import logging
+import os
 import re
+import shutil
+import tempfile
+import threading
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
-from ruamel.yaml import YAML
 
 logger = logging.getLogger(__name__)
 
+# 配置文件头注释（每行以换行结尾，头部之后留一个空行）
+_SINGLE_FILE_HEADER = "\n".join([
+    "# 任务配置文件格式说明：",
+    "# 1. 每个任务块以空行分隔",
+    "# 2. 第一行：队列ID（数字，可跟注释如 '1 #队列ID'）",
+    "# 3. 中间行：命令列表（建议用引号包围，支持变量 {work_dir} 和 {uni_id}）",
+    "# 4. 最后一行：显存需求（数字，可跟注释如 '20 #显存'）",
+    "# 5. 支持的变量：",
+    "#    - {work_dir}: 工作目录（脚本父目录）",
+    "#    - {uni_id}: 唯一标识符（自动生成）",
+    "#",
+    "# 示例任务块：",
+    "# 1 #队列ID",
+    '# "命令1"',
+    '# "命令2"',
+    '# "命令3"',
+    "# 20 #显存需求",
+    "#",
+    "# ==================== 任务列表 ====================",
+]) + "\n\n"
+
+_MULTI_FILE_HEADER = "\n".join([
+    "# 任务配置文件格式说明：",
+    "# 1. 每个任务块以空行分隔",
+    "# 2. 第一行：队列ID（数字，可跟注释如 '1 #队列ID'）",
+    "# 3. 第二行：命令列表（建议用引号包围，支持变量 {work_dir} 和 {uni_id}）",
+    "# 4. 第三行：GPU数量需求（数字，可跟注释如 '1 #GPU数量需求'）",
+    "# 5. 最后一行：显存需求（数字，可跟注释如 '20 #显存'）",
+    "# 6. 支持的变量：",
+    "#    - {work_dir}: 工作目录（脚本父目录）",
+    "#    - {uni_id}: 唯一标识符（自动生成）",
+    "#",
+    "# 示例任务块：",
+    "# 1 #队列ID",
+    '# "命令1"',
+    '# "命令2"',
+    '# "命令3"',
+    "# 1 #GPU数量需求",
+    "# 20 #显存需求",
+    "#",
+    "# ==================== 任务列表 ====================",
+]) + "\n\n"
+
+# 命令文件逐行扫描：line 为去除首尾空白后的整行，number 为行首可被 int() 解析的整数 token
+_COMMAND_LINE_RE = re.compile(
+    r"^[^\S\n]*(?P<line>(?P<number>[+-]?\d+(?:_\d+)*(?!\S))?.*?)[^\S\n]*$",
+    re.MULTILINE,
+)
+
 
 class CommandConfigHandler:
     """命令配置处理器 - 支持多配置文件"""
@@ -36,6 +90,9 @@ class CommandConfigHandler:
             
         # 命令配置文件目录
         self.command_dir = self.project_root / "command"
+        
+        # 解析结果缓存：(path, mode) -> ((mtime_ns, size), queues)
+        self._parse_cache: Dict[tuple, tuple] = {}
     
     def _get_config_file_path(self, mode: str, config_index: int = 0) -> Path:
         """
@@ -60,15 +117,15 @@ class CommandConfigHandler:
         else:
             return self.command_dir / f"{base_name}_{config_index}.txt"
     
-    def list_configs(self, mode: str = "single") -> List[Dict[str, Any]]:
+    def _scan_configs(self, mode: str = "single") -> List[Dict[str, Any]]:
         """
-        列出所有配置文件
+        扫描配置文件（内部使用，保留 Path 对象）
         
         Args:
             mode: 模式，"single" 表示单卡，"multi" 表示多卡
             
         Returns:
-            配置列表，每个元素包含 index, name, file_path, exists
+            配置列表，每个元素包含 index, name, path
         """
         configs = []
         
@@ -99,20 +156,15 @@ class CommandConfigHandler:
                     configs.append({
                         "index": index,
                         "name": name,
-                        "file_path": str(file_path),
-                        "file_name": file_path.name,
-                        "exists": file_path.exists()
+                        "path": file_path
                     })
         
         # 如果没有找到任何配置，添加默认配置
         if not configs:
-            default_path = self._get_config_file_path(mode, 0)
             configs.append({
                 "index": 0,
                 "name": "配置 1",
-                "file_path": str(default_path),
-                "file_name": default_path.name,
-                "exists": default_path.exists()
+                "path": self._get_config_file_path(mode, 0)
             })
         
         # 按索引排序
@@ -120,6 +172,27 @@ class CommandConfigHandler:
         
         return configs
     
+    def list_configs(self, mode: str = "single") -> List[Dict[str, Any]]:
+        """
+        列出所有配置文件
+        
+        Args:
+            mode: 模式，"single" 表示单卡，"multi" 表示多卡
+            
+        Returns:
+            配置列表，每个元素包含 index, name, file_path, exists
+        """
+        return [
+            {
+                "index": config["index"],
+                "name": config["name"],
+                "file_path": str(config["path"]),
+                "file_name": config["path"].name,
+                "exists": config["path"].exists()
+            }
+            for config in self._scan_configs(mode)
+        ]
+    
     def load_all_configs(self, mode: str = "single") -> Dict[str, Any]:
         """
         加载所有配置
@@ -130,23 +203,22 @@ class CommandConfigHandler:
         Returns:
             包含所有配置的字典
         """
-        configs = self.list_configs(mode)
         result = {
             "mode": mode,
             "configs": []
         }
         
-        for config_info in configs:
+        for config_info in self._scan_configs(mode):
+            file_path = config_info["path"]
             config_data = {
                 "index": config_info["index"],
                 "name": config_info["name"],
-                "file_name": config_info["file_name"],
+                "file_name": file_path.name,
                 "queues": []
             }
             
-            if config_info["exists"]:
+            if file_path.exists():
                 try:
-                    file_path = Path(config_info["file_path"])
                     queues = self._parse_command_file(file_path, mode)
                     config_data["queues"] = queues
                 except Exception as e:
@@ -203,6 +275,7 @@ class CommandConfigHandler:
         Returns:
             是否保存成功
         """
+        tmp_file = None
         try:
             config_file = self._get_config_file_path(mode, config_index)
             
@@ -211,19 +284,22 @@ class CommandConfigHandler:
             # 确保目录存在
             config_file.parent.mkdir(parents=True, exist_ok=True)
             
-            # 备份原文件
+            # 生成配置文件内容，先完整写入临时文件（每次保存使用独立的临时文件，并发保存互不覆盖）
+            content = self._generate_file_content(data.get("queues", []), mode)
+            fd, tmp_file = tempfile.mkstemp(prefix=f"{config_file.name}.", suffix=".tmp", dir=config_file.parent)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.chmod(tmp_file, 0o644)  # mkstemp 创建的文件权限为 0600
+            
+            # 新内容写入成功后再备份原文件：硬链接到备份文件，无需复制数据
             if config_file.exists():
-                import shutil
                 backup_file = config_file.parent / (config_file.stem + '.txt.backup')
-                shutil.copy2(config_file, backup_file)
+                self._backup_file(config_file, backup_file)
                 logger.info(f"已备份原配置文件到: {backup_file}")
             
-            # 生成配置文件内容
-            content = self._generate_file_content(data.get("queues", []), mode)
-            
-            # 保存文件
-            with config_file.open("w", encoding="utf-8") as f:
-                f.write(content)
+            # 原子替换，读取方不会看到写了一半的配置文件
+            os.replace(tmp_file, config_file)
+            tmp_file = None
             
             logger.info("命令配置保存成功")
             return True
@@ -231,6 +307,35 @@ class CommandConfigHandler:
         except Exception as e:
             logger.error(f"保存命令配置失败: {e}")
             return False
+        finally:
+            # 保存失败时清理临时文件
+            if tmp_file is not None:
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+    
+    @staticmethod
+    def _backup_file(source: Path, backup_file: Path) -> None:
+        """将 source 备份为 backup_file（优先硬链接，文件系统不支持时回退到复制）"""
+        # 临时链接名按进程和线程区分，并发保存不会互相覆盖
+        tmp_link = backup_file.parent / f"{backup_file.name}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            if tmp_link.exists():
+                tmp_link.unlink()
+            os.link(source, tmp_link)
+            os.replace(tmp_link, backup_file)
+        except OSError:
+            # 并发保存时备份可能已经是同一文件的硬链接，无需再复制
+            if backup_file.exists() and os.path.samefile(source, backup_file):
+                return
+            shutil.copy2(source, backup_file)
+        finally:
+            # backup_file 已是同一文件的硬链接时 os.replace 不做任何操作，临时链接需要手动删除
+            try:
+                tmp_link.unlink()
+            except FileNotFoundError:
+                pass
     
     def create_new_config(self, mode: str = "single") -> Dict[str, Any]:
         """
@@ -242,7 +347,7 @@ class CommandConfigHandler:
         Returns:
             新配置信息
         """
-        configs = self.list_configs(mode)
+        configs = self._scan_configs(mode)
         
         # 找到下一个可用的索引
         existing_indices = {c["index"] for c in configs}
@@ -304,24 +409,35 @@ class CommandConfigHandler:
         Returns:
             队列配置列表（队列下包含多个进程）
         """
+        st = file_path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cache_key = (str(file_path), mode)
+        cached = self._parse_cache.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            return copy.deepcopy(cached[1])
+        
         # 使用字典来组织队列和进程
         queues_dict = {}
         current_queue = None
         
+        # 逐行流式解析，不把整个文件读入内存；每行由预编译正则给出去除首尾空白后的内容和行首整数（若有）
         with file_path.open("r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            
-            # 跳过空行和注释行
-            if not line or line.startswith("#"):
-                continue
-            
-            # 解析队列ID行（当前没有正在解析的任务块）
-            if current_queue is None:
-                try:
-                    queue_id = int(line.split()[0])
+            for line_num, raw_line in enumerate(f, 1):
+                match = _COMMAND_LINE_RE.match(raw_line)
+                line = match.group("line")
+                
+                # 跳过空行和注释行
+                if not line or line[0] == "#":
+                    continue
+                
+                number_token = match.group("number")
+                
+                # 解析队列ID行（当前没有正在解析的任务块）
+                if current_queue is None:
+                    if number_token is None:
+                        logger.warning(f"第 {line_num} 行：无效的队列ID: {line}")
+                        continue
+                    queue_id = int(number_token)
                     if queue_id not in queues_dict:
                         queues_dict[queue_id] = {
                             "id": queue_id,
@@ -333,22 +449,17 @@ class CommandConfigHandler:
                         "gpu_count": 1 if mode == "single" else None,
                         "memory": None
                     }
-                except ValueError:
-                    logger.warning(f"第 {line_num} 行：无效的队列ID: {line}")
-                    continue
-            else:
-                # 尝试解析为数字（GPU数量或显存需求）
-                first_token = line.split()[0]
-                try:
-                    number = int(first_token)
-                    
+                elif number_token is not None:
+                    # 数字行（GPU数量或显存需求）
+                    number = int(number_token)
+                
                     # 多卡模式：先解析GPU数量，再解析显存
                     if mode == "multi" and current_queue["gpu_count"] is None:
                         current_queue["gpu_count"] = number
                     elif current_queue["memory"] is None:
                         # 这是显存需求，任务块结束
                         current_queue["memory"] = number
-                        
+                    
                         # 将当前进程添加到队列中
                         process_data = {
                             "id": len(queues_dict[current_queue["id"]]["processes"]) + 1,
@@ -361,10 +472,10 @@ class CommandConfigHandler:
                     else:
                         # 数字但不是GPU数量也不是显存，当作命令处理
                         current_queue["commands"].append(line)
-                except ValueError:
+                else:
                     # 不是数字，是命令行
                     # 去掉引号（如果有）
-                    if line.startswith('"') and line.endswith('"'):
+                    if line[:1] == '"' == line[-1:]:
                         command = line[1:-1]
                     else:
                         command = line
@@ -375,7 +486,8 @@ class CommandConfigHandler:
         
         total_processes = sum(len(queue["processes"]) for queue in queues)
         logger.info(f"解析完成，共 {len(queues)} 个队列，{total_processes} 个进程")
-        return queues
+        self._parse_cache[cache_key] = (stamp, queues)
+        return copy.deepcopy(queues)
     
     def _generate_file_content(self, queues: List[Dict[str, Any]], mode: str) -> str:
         """
@@ -388,77 +500,35 @@ class CommandConfigHandler:
         Returns:
             文件内容字符串
         """
-        lines = []
+        buf = io.StringIO()
+        write = buf.write
         
         # 添加文件头注释
-        if mode == "single":
-            lines.extend([
-                "# 任务配置文件格式说明：",
-                "# 1. 每个任务块以空行分隔",
-                "# 2. 第一行：队列ID（数字，可跟注释如 '1 #队列ID'）",
-                "# 3. 中间行：命令列表（建议用引号包围，支持变量 {work_dir} 和 {uni_id}）",
-                "# 4. 最后一行：显存需求（数字，可跟注释如 '20 #显存'）",
-                "# 5. 支持的变量：",
-                "#    - {work_dir}: 工作目录（脚本父目录）",
-                "#    - {uni_id}: 唯一标识符（自动生成）",
-                "#",
-                "# 示例任务块：",
-                "# 1 #队列ID",
-                '# "命令1"',
-                '# "命令2"',
-                '# "命令3"',
-                "# 20 #显存需求",
-                "#",
-                "# ==================== 任务列表 ====================",
-                ""
-            ])
-        else:  # multi
-            lines.extend([
-                "# 任务配置文件格式说明：",
-                "# 1. 每个任务块以空行分隔",
-                "# 2. 第一行：队列ID（数字，可跟注释如 '1 #队列ID'）",
-                "# 3. 第二行：命令列表（建议用引号包围，支持变量 {work_dir} 和 {uni_id}）",
-                "# 4. 第三行：GPU数量需求（数字，可跟注释如 '1 #GPU数量需求'）",
-                "# 5. 最后一行：显存需求（数字，可跟注释如 '20 #显存'）",
-                "# 6. 支持的变量：",
-                "#    - {work_dir}: 工作目录（脚本父目录）",
-                "#    - {uni_id}: 唯一标识符（自动生成）",
-                "#",
-                "# 示例任务块：",
-                "# 1 #队列ID",
-                '# "命令1"',
-                '# "命令2"',
-                '# "命令3"',
-                "# 1 #GPU数量需求",
-                "# 20 #显存需求",
-                "#",
-                "# ==================== 任务列表 ====================",
-                ""
-            ])
+        write(_SINGLE_FILE_HEADER if mode == "single" else _MULTI_FILE_HEADER)
         
         # 添加队列配置
         for queue in queues:
             processes = queue.get("processes", [])
+            queue_line = f"{queue['id']}\n"
             
-            for i, process in enumerate(processes):
+            for process in processes:
                 # 添加队列ID
-                lines.append(str(queue["id"]))
+                write(queue_line)
                 
                 # 添加命令（不使用引号）
                 for command in process.get("commands", []):
-                    lines.append(command)
+                    write(command)
+                    write("\n")
                 
                 # 多卡模式添加GPU数量
                 if mode == "multi":
-                    lines.append(str(process.get("gpu_count", 1)))
-                
-                # 添加显存需求
-                lines.append(str(process.get("memory", 20)))
+                    write(f"{process.get('gpu_count', 1)}\n")
                 
-                # 添加空行分隔
-                lines.append("")
+                # 添加显存需求，并以空行分隔
+                write(f"{process.get('memory', 20)}\n\n")
         
-        return "\n".join(lines)
+        # 与逐行 "\n".join 的结果保持一致：末尾不额外追加换行
+        return buf.getvalue()[:-1]
     
     def reset_command_config(self, mode: str = "single", config_index: int = 0) -> bool:
         """
@@ -483,7 +553,6 @@ class CommandConfigHandler:
                 return False
             
             # 从备份文件恢复
-            import shutil
             shutil.copy2(backup_file, config_file)
             
             logger.info(f"命令配置重置成功，从备份文件恢复: {backup_file}")
@@ -5,6 +5,7 @@ YAML 配置文件处理模块
 """
 
 import re
+import copy
 import logging
 from pathlib import Path
 from typing import Any, Dict
@@ -12,6 +13,25 @@ from ruamel.yaml import YAML
 
 logger = logging.getLogger(__name__)
 
+# save_config 中按顶级键做字符串替换的键列表
+SIMPLE_KEYS = ['check_time', 'maximize_resource_utilization', 'memory_save_mode', 'compete_gpus', 
+               'use_all_gpus', 'gpu_left', 'min_gpu', 'max_gpu', 'work_dir',
+               'gpu_command_file', 'gpus_command_file']
+# retry_config 下的嵌套键
+RETRY_KEYS = ['max_retry_before_backoff', 'backoff_duration']
+
+# 预编译的单次替换正则：顶级键必须顶格，retry_config 下的键允许缩进；
+# 冒号后只匹配同一行内的空白，值为空时不会吞掉下一行
+# 匹配: key: value  # comment 或 key: value
+_SAVE_CONFIG_RE = re.compile(
+    r'^(?P<prefix>(?:(?P<simple>' + '|'.join(SIMPLE_KEYS) + r')|\s*(?P<retry>' + '|'.join(RETRY_KEYS) + r')):[^\S\n]*)'
+    r'(?P<value>[^\n#]*)(?P<comment>#.*)?$',
+    re.MULTILINE,
+)
+
+# 字符串值中出现这些 YAML 特殊字符时需要加引号
+_SPECIAL_RE = re.compile(r'[:#\[\]{},&*?|\-<>=!%@`]')
+
 
 class YAMLConfigHandler:
     """YAML 配置文件处理器"""
@@ -27,6 +47,8 @@ class YAMLConfigHandler:
         self.ryaml = YAML()
         self.ryaml.preserve_quotes = True
         self.ryaml.width = 4096  # 避免数组换行
+        # 解析结果缓存：((mtime_ns, size), data)，文件未变化时跳过解析
+        self._cache = None
     
     def load_config(self) -> Dict[str, Any]:
         """
@@ -39,15 +61,23 @@ class YAMLConfigHandler:
             FileNotFoundError: 文件不存在
         """
         logger.info(f"读取配置文件: {self.target_path}")
-        if not self.target_path.is_file():
+        # 单次 stat 同时完成存在性检查和缓存校验
+        try:
+            st = self.target_path.stat()
+        except FileNotFoundError:
             logger.error(f"目标配置文件不存在: {self.target_path}")
             raise FileNotFoundError(f"目标配置文件不存在: {self.target_path}")
         
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._cache is not None and self._cache[0] == stamp:
+            return copy.deepcopy(self._cache[1])
+        
         with self.target_path.open("r", encoding="utf-8") as f:
             data = self.ryaml.load(f) or {}
+        self._cache = (stamp, data)
         
         logger.info(f"成功读取配置，包含 {len(data)} 个顶级键")
-        return data
+        return copy.deepcopy(data)
     
     def save_config(self, data: Dict[str, Any]) -> None:
         """
@@ -66,35 +96,35 @@ class YAMLConfigHandler:
             else:
                 content = ""
             
-            # 处理简单键值对
-            simple_keys = ['check_time', 'maximize_resource_utilization', 'memory_save_mode', 'compete_gpus', 
-                           'use_all_gpus', 'gpu_left', 'min_gpu', 'max_gpu', 'work_dir',
-                           'gpu_command_file', 'gpus_command_file']
+            # 预先格式化所有需要写入的值，再对文件内容做一次替换扫描
+            simple_values = {key: self._format_value(key, data[key]) for key in SIMPLE_KEYS if key in data}
+            retry_values = {}
+            if 'retry_config' in data and isinstance(data['retry_config'], dict):
+                retry_config = data['retry_config']
+                retry_values = {key: self._format_nested_value(retry_config[key]) for key in RETRY_KEYS if key in retry_config}
             
-            for key in simple_keys:
-                if key in data:
-                    value = data[key]
-                    formatted_value = self._format_value(key, value)
-                    # 匹配: key: value  # comment 或 key: value
-                    pattern = rf'^({key}:\s*)([^\n#]*)(#.*)?$'
-                    
-                    def replace_func(match, fv=formatted_value):
-                        prefix = match.group(1)  # "key: "
-                        comment = match.group(3) or ""  # "# comment" 或空
-                        if comment:
-                            return f"{prefix}{fv}  {comment}"
-                        else:
-                            return f"{prefix}{fv}"
-                    
-                    content = re.sub(pattern, replace_func, content, flags=re.MULTILINE)
+            def replace_func(match):
+                if match.group("simple") is not None:
+                    fv = simple_values.get(match.group("simple"))
+                else:
+                    fv = retry_values.get(match.group("retry"))
+                if fv is None:
+                    return match.group(0)
+                prefix = match.group("prefix")  # "key: "
+                if prefix.endswith(":"):
+                    prefix += " "  # 原值为空时补上冒号后的空格
+                comment = match.group("comment") or ""  # "# comment" 或空
+                if comment:
+                    return f"{prefix}{fv}  {comment}"
+                else:
+                    return f"{prefix}{fv}"
             
-            # 处理嵌套的 retry_config
-            if 'retry_config' in data and isinstance(data['retry_config'], dict):
-                content = self._process_retry_config(data['retry_config'], content)
+            content = _SAVE_CONFIG_RE.sub(replace_func, content)
             
             # 写入文件
             with self.target_path.open("w", encoding="utf-8") as f:
                 f.write(content)
+            self._cache = None
             
             logger.info("配置保存成功")
         except Exception as e:
@@ -131,49 +161,12 @@ class YAMLConfigHandler:
                     return value  # 无法转换则保持原值
             
             # 其他字符串字段，如果包含特殊字符，加引号
-            if any(c in value for c in [':', '#', '[', ']', '{', '}', ',', '&', '*', '?', '|', '-', '<', '>', '=', '!', '%', '@', '`']):
+            if _SPECIAL_RE.search(value):
                 return f'"{value}"'
             return value
         else:
             return str(value)
     
-    def _process_retry_config(self, retry_config: Dict[str, Any], content: str) -> str:
-        """
-        处理嵌套的 retry_config 配置
-        
-        Args:
-            retry_config: 重试配置字典
-            content: 原始文件内容
-            
-        Returns:
-            处理后的文件内容
-        """
-        if 'max_retry_before_backoff' in retry_config:
-            pattern = r'^(\s*max_retry_before_backoff:\s*)([^\n#]*)(#.*)?$'
-            def replace_func(match, val=retry_config['max_retry_before_backoff']):
-                prefix = match.group(1)
-                comment = match.group(3) or ""
-                formatted_val = self._format_nested_value(val)
-                if comment:
-                    return f"{prefix}{formatted_val}  {comment}"
-                else:
-                    return f"{prefix}{formatted_val}"
-            content = re.sub(pattern, replace_func, content, flags=re.MULTILINE)
-        
-        if 'backoff_duration' in retry_config:
-            pattern = r'^(\s*backoff_duration:\s*)([^\n#]*)(#.*)?$'
-            def replace_func(match, val=retry_config['backoff_duration']):
-                prefix = match.group(1)
-                comment = match.group(3) or ""
-                formatted_val = self._format_nested_value(val)
-                if comment:
-                    return f"{prefix}{formatted_val}  {comment}"
-                else:
-                    return f"{prefix}{formatted_val}"
-            content = re.sub(pattern, replace_func, content, flags=re.MULTILINE)
-        
-        return content
-    
     def _format_nested_value(self, value: Any) -> str:
         """
         格式化嵌套配置的值
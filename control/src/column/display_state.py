@@ -10,6 +10,9 @@
 
 import os
 import json
+import time
+import select
+import signal
 import logging
 from pathlib import Path
 from typing import Dict, List, Optional, Any
@@ -114,10 +117,33 @@ class SchedulerStateManager:
                 schedulers.append(status)
         return schedulers
     
+    def _wait_for_exit(self, pid: int, timeout: float) -> bool:
+        """等待进程退出，返回进程是否已退出
+        
+        优先使用 pidfd（Linux >= 5.3）阻塞等待退出事件，不支持时回退到轮询
+        """
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        
+        if pidfd is not None:
+            try:
+                readable, _, _ = select.select([pidfd], [], [], timeout)
+                return bool(readable)
+            finally:
+                os.close(pidfd)
+        
+        # 回退：轮询检查
+        deadline = time.monotonic() + timeout
+        while self._is_process_running(pid):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+    
     def stop_scheduler(self, pid: int) -> Dict[str, Any]:
         """停止调度器"""
-        import signal
-        
         # 检查进程是否存在
         if not self._is_process_running(pid):
             return {"success": False, "message": f"进程 {pid} 不存在"}
@@ -126,18 +152,14 @@ class SchedulerStateManager:
             # 发送 SIGTERM 信号
             os.kill(pid, signal.SIGTERM)
             
-            # 等待进程结束
-            import time
-            for _ in range(10):
-                if not self._is_process_running(pid):
-                    break
-                time.sleep(0.5)
-            
-            # 检查是否成功停止
-            if self._is_process_running(pid):
-                # 进程仍在运行，发送 SIGKILL
+            # 等待进程结束，超时后发送 SIGKILL
+            if not self._wait_for_exit(pid, 3.0):
                 os.kill(pid, signal.SIGKILL)
+                self._wait_for_exit(pid, 1.0)
             
+            return {"success": True, "message": f"调度器 (PID: {pid}) 已停止"}
+        except ProcessLookupError:
+            # 等待期间进程已退出
             return {"success": True, "message": f"调度器 (PID: {pid}) 已停止"}
         except Exception as e:
             return {"success": False, "message": f"停止失败: {str(e)}"}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+GPU 信息后台采集模块
+
+功能：
+- 后台守护线程按固定间隔采集 GPU 概要信息
+- 请求处理直接读取最近一次采集结果，不在请求路径上调用 NVML
+- 采集结果在后台线程中序列化一次，请求直接返回序列化后的字节
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from column.manage_gpu import get_gpu_summary, GPU_POLL_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data: Dict[str, Any]) -> bytes:
+    """序列化采集结果（orjson 原生支持 datetime，标准库回退时转为 ISO 格式）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, default=lambda o: o.isoformat()).encode("utf-8")
+
+
+class GpuPoller:
+    """GPU 信息后台采集器"""
+
+    def __init__(self, interval: float = GPU_POLL_INTERVAL_SECONDS,
+                 collect: Callable[[], Dict[str, Any]] = get_gpu_summary):
+        """初始化采集器
+
+        Args:
+            interval: 采集间隔（秒）
+            collect: 采集函数，返回 GPU 概要信息
+        """
+        self.interval = interval
+        self._collect = collect
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._latest_json: Optional[bytes] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最近一次采集结果（尚未完成首次采集时为 None）"""
+        with self._lock:
+            return self._latest
+
+    @property
+    def latest_json(self) -> Optional[bytes]:
+        """最近一次采集结果的 JSON 字节（尚未完成首次采集时为 None）"""
+        with self._lock:
+            return self._latest_json
+
+    def start(self):
+        """启动后台采集线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gpu-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"GPU 后台采集已启动，间隔 {self.interval} 秒")
+
+    def stop(self):
+        """停止后台采集线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        """采集循环"""
+        while not self._stop_event.is_set():
+            try:
+                snapshot = self._collect()
+                body = _dumps(snapshot)
+                with self._lock:
+                    self._latest = snapshot
+                    self._latest_json = body
+            except Exception as e:
+                logger.error(f"后台采集 GPU 信息失败: {e}")
+            self._stop_event.wait(self.interval)
+
+
+# 全局实例
+_gpu_poller: Optional[GpuPoller] = None
+
+
+def get_gpu_poller(interval: float = GPU_POLL_INTERVAL_SECONDS) -> GpuPoller:
+    """获取 GPU 采集器实例"""
+    global _gpu_poller
+    if _gpu_poller is None:
+        _gpu_poller = GpuPoller(interval)
+    return _gpu_poller
@@ -4,12 +4,43 @@ GPU 管理模块
 提供类似 nvitop 的 GPU 信息展示功能
 """
 
+import os
+import time
 import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# GPU 信息采集结果的缓存时间（秒），多个客户端/频繁刷新在该时间内共享同一次 NVML 采集
+GPU_POLL_INTERVAL_SECONDS = float(os.environ.get("GPU_POLL_INTERVAL_SECONDS", "2.0"))
+
+# GPU 进程列表的缓存时间（秒）；进程枚举是最重的部分且变化较慢，刷新频率低于利用率/温度等指标
+GPU_PROCESS_POLL_INTERVAL_SECONDS = float(os.environ.get("GPU_PROCESS_POLL_INTERVAL_SECONDS", "5.0"))
+
+
+def _ttl_cached(ttl: float):
+    """TTL 缓存装饰器：缓存期内直接返回上次结果；持锁采集，保证并发请求只触发一次采集"""
+    def decorator(func):
+        lock = threading.Lock()
+        cache = [0.0, None]  # [采集时间, 结果]
+        
+        @functools.wraps(func)
+        def wrapper():
+            with lock:
+                now = time.monotonic()
+                if cache[1] is None or now - cache[0] >= ttl:
+                    cache[1] = func()
+                    cache[0] = now
+                return cache[1]
+        
+        return wrapper
+    
+    return decorator
+
 # 尝试导入 nvitop
 try:
     from nvitop import Device, GpuProcess, NA
@@ -18,7 +49,111 @@ except ImportError:
     NVITOP_AVAILABLE = False
     logger.warning("nvitop 未安装，GPU 监控功能不可用")
 
+# psutil 随 nvitop 一同安装；导入时先做一次 CPU 采样，之后 cpu_percent(None) 非阻塞地返回距上次调用的增量
+try:
+    import psutil
+    psutil.cpu_percent(interval=None)
+except ImportError:
+    psutil = None
+
+# 功耗通过 nvmlDeviceGetFieldValues 一次取回（需要较新的驱动/pynvml，不支持时回退到逐项查询）
+_POWER_FIELD_IDS = None
+if NVITOP_AVAILABLE:
+    try:
+        from nvitop import libnvml, bytes2human
+        _POWER_FIELD_IDS = [libnvml.NVML_FI_DEV_POWER_INSTANT, libnvml.NVML_FI_DEV_POWER_CURRENT_LIMIT]
+    except (ImportError, AttributeError):
+        from nvitop import bytes2human
+
+# Device 句柄缓存：设备列表在驱动不重载的情况下不会变化，只枚举一次
+_DEVICES: Optional[List["Device"]] = None
+
+# 设备静态信息缓存（名称、UUID、总显存、驱动版本），按设备 index 索引，驱动生命周期内不会变化
+_STATIC_CACHE: Dict[int, Dict[str, Any]] = {}
+
+# GPU 进程对应的主机进程对象缓存（pid -> HostProcess），跨采集周期保留，
+# 使 cpu_percent() 有上一次采样可做差（新建对象首次调用恒为 0）
+_HOST_PROCESSES: Dict[int, Any] = {}
+
+# 并行查询各 GPU 信息的线程池，首次使用时创建
+_QUERY_EXECUTOR: Optional[ThreadPoolExecutor] = None
 
+
+def _get_devices() -> List["Device"]:
+    """获取缓存的 GPU 设备列表（首次调用时枚举）"""
+    global _DEVICES
+    if _DEVICES is None:
+        _DEVICES = Device.all()
+    return _DEVICES
+
+
+def _get_query_executor() -> ThreadPoolExecutor:
+    """获取用于并行查询各 GPU 的线程池（跨请求复用）"""
+    global _QUERY_EXECUTOR
+    if _QUERY_EXECUTOR is None:
+        _QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gpu-query")
+    return _QUERY_EXECUTOR
+
+
+def _reset_devices():
+    """清空设备缓存，下次调用时重新枚举（NVML 出错后用于驱动重载等场景的自动恢复）"""
+    global _DEVICES
+    _DEVICES = None
+    _STATIC_CACHE.clear()
+
+
+# NVML 连续失败达到阈值后进入退避：窗口内不再访问 NVML，窗口按指数增长，上限 10 分钟
+NVML_FAILURE_THRESHOLD = 3
+NVML_BACKOFF_BASE_SECONDS = 5.0
+NVML_BACKOFF_MAX_SECONDS = 600.0
+
+
+class _NvmlBackoff:
+    """NVML 失败退避状态，只在状态切换（首次失败、进入退避、恢复）时记录日志"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+    
+    def blocked(self) -> bool:
+        """是否处于退避窗口内"""
+        return self.failures >= NVML_FAILURE_THRESHOLD and time.monotonic() < self.retry_at
+    
+    def remaining(self) -> int:
+        """退避窗口剩余秒数"""
+        return max(0, int(self.retry_at - time.monotonic()))
+    
+    def record_failure(self, message: str, error: Exception):
+        """记录一次失败，清空设备缓存以便恢复后重新枚举"""
+        _reset_devices()
+        with self._lock:
+            self.failures += 1
+            failures = self.failures
+            delay = 0.0
+            if failures >= NVML_FAILURE_THRESHOLD:
+                exponent = min(failures - NVML_FAILURE_THRESHOLD, 16)
+                delay = min(NVML_BACKOFF_BASE_SECONDS * (2 ** exponent), NVML_BACKOFF_MAX_SECONDS)
+                self.retry_at = time.monotonic() + delay
+        if failures == 1:
+            logger.error(f"{message}: {error}")
+        elif failures == NVML_FAILURE_THRESHOLD:
+            logger.warning(f"NVML 连续失败 {failures} 次，暂停访问 {delay:.0f} 秒（此后仅在恢复时记录日志）: {error}")
+        else:
+            logger.debug(f"{message}（连续第 {failures} 次，{delay:.0f} 秒后重试）: {error}")
+    
+    def record_success(self):
+        """记录一次成功，重置失败计数"""
+        if self.failures:
+            with self._lock:
+                failures, self.failures, self.retry_at = self.failures, 0, 0.0
+            logger.info(f"NVML 已恢复（此前连续失败 {failures} 次）")
+
+
+_NVML_BACKOFF = _NvmlBackoff()
+
+
+@_ttl_cached(GPU_POLL_INTERVAL_SECONDS)
 def get_host_info() -> Dict[str, Any]:
     """获取主机信息"""
     if not NVITOP_AVAILABLE:
@@ -26,10 +161,9 @@ def get_host_info() -> Dict[str, Any]:
     
     try:
         import platform
-        import psutil
         
-        # CPU 信息
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        # CPU 信息（非阻塞，返回距上次采集的平均占用）
+        cpu_percent = psutil.cpu_percent(interval=None)
         cpu_count = psutil.cpu_count()
         
         # 内存信息
@@ -62,20 +196,23 @@ def get_host_info() -> Dict[str, Any]:
                 "total_human": _format_bytes(swap.total),
                 "used_human": _format_bytes(swap.used),
             },
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
         }
     except Exception as e:
         logger.error(f"获取主机信息失败: {e}")
         return {"error": str(e)}
 
 
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+
 def _format_bytes(bytes_val: int) -> str:
     """格式化字节数为人类可读格式"""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_val < 1024:
-            return f"{bytes_val:.1f}{unit}"
-        bytes_val /= 1024
-    return f"{bytes_val:.1f}PB"
+    if bytes_val < 1024:
+        return f"{bytes_val:.1f}B"
+    # bit_length 直接给出 1024 的幂次，免去逐级除法循环
+    i = min((int(bytes_val).bit_length() - 1) // 10, 5)
+    return f"{bytes_val / (1 << (i * 10)):.1f}{_BYTE_UNITS[i]}"
 
 
 def _safe_value(val, default="N/A"):
@@ -100,11 +237,81 @@ def _get_clock_infos(device) -> Dict[str, Any]:
         return {"graphics": 0, "memory": 0, "sm": 0}
 
 
-def _get_power_info(device) -> Dict[str, Any]:
-    """获取功耗信息"""
+# nvmlFieldValue_t.valueType -> value 联合体中对应的成员名
+_FIELD_VALUE_MEMBERS = {0: "dVal", 1: "uiVal", 2: "ulVal", 3: "ullVal", 4: "sllVal", 5: "siVal"}
+
+
+def _query_power_fields(device) -> Optional[tuple]:
+    """用一次 FieldValues 调用取回 (当前功耗, 功耗上限)，单位毫瓦；不支持时返回 None"""
+    global _POWER_FIELD_IDS
+    if _POWER_FIELD_IDS is None:
+        return None
+    try:
+        values = libnvml.nvmlDeviceGetFieldValues(device.handle, _POWER_FIELD_IDS)
+    except Exception:
+        # 驱动不支持时不再尝试，后续直接走逐项查询
+        _POWER_FIELD_IDS = None
+        return None
+    result = []
+    for fv in values:
+        if fv.nvmlReturn != 0:
+            return None
+        result.append(getattr(fv.value, _FIELD_VALUE_MEMBERS.get(fv.valueType, "uiVal")))
+    return tuple(result)
+
+
+def _bulk_query(device) -> Dict[str, Any]:
+    """
+    合并查询设备的动态指标
+    
+    显存 total/used/free 由一次 memory_info() 得到，GPU/显存利用率由一次 utilization_rates() 得到，
+    功耗尽量用一次 FieldValues 调用得到，替代原先逐项调用的十余次 NVML 查询
+    """
+    mem = device.memory_info()
+    total = _safe_value(getattr(mem, "total", None), 0)
+    used = _safe_value(getattr(mem, "used", None), 0)
+    free = _safe_value(getattr(mem, "free", None), 0)
+    util = device.utilization_rates()
+    power = _query_power_fields(device)
+    if power is None:
+        power = (_safe_value(device.power_usage(), 0), _safe_value(device.power_limit(), 0))
+    return {
+        "memory_total": total,
+        "memory_used": used,
+        "memory_free": free,
+        "memory_percent": round(100.0 * used / total, 1) if total else 0,
+        "gpu_util": _safe_value(getattr(util, "gpu", None), 0),
+        "memory_util": _safe_value(getattr(util, "memory", None), 0),
+        "power_draw": power[0],
+        "power_limit": power[1],
+    }
+
+
+def _get_static_info(device, memory_total: int) -> Dict[str, Any]:
+    """获取设备静态信息，首次查询后缓存"""
+    static = _STATIC_CACHE.get(device.index)
+    if static is None:
+        static = {
+            "name": _safe_value(device.name()),
+            "uuid": _safe_value(device.uuid()),
+            "memory_total": memory_total,
+            "memory_total_human": bytes2human(memory_total) if memory_total else "N/A",
+            "driver_version": _safe_value(device.driver_version(), "N/A"),
+        }
+        # 查询失败（N/A）时不缓存，下次重试
+        if static["name"] != "N/A" and memory_total:
+            _STATIC_CACHE[device.index] = static
+    return static
+
+
+def _get_power_info(device, bulk: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """获取功耗信息（bulk 为 _bulk_query 结果，提供时不再单独查询）"""
     try:
-        draw = _safe_value(device.power_usage(), 0)
-        limit = _safe_value(device.power_limit(), 0)
+        if bulk is not None:
+            draw, limit = bulk["power_draw"], bulk["power_limit"]
+        else:
+            draw = _safe_value(device.power_usage(), 0)
+            limit = _safe_value(device.power_limit(), 0)
         # 功耗单位是毫瓦，转换为瓦
         draw_w = draw / 1000 if draw else 0
         limit_w = limit / 1000 if limit else 0
@@ -120,68 +327,86 @@ def _get_power_info(device) -> Dict[str, Any]:
 
 def get_gpu_list() -> List[Dict[str, Any]]:
     """获取所有 GPU 设备列表"""
-    if not NVITOP_AVAILABLE:
+    if not NVITOP_AVAILABLE or _NVML_BACKOFF.blocked():
         return []
     
     try:
-        devices = Device.all()
+        devices = _get_devices()
         gpu_list = []
         
         for device in devices:
             gpu_info = get_gpu_info(device)
             gpu_list.append(gpu_info)
         
+        _NVML_BACKOFF.record_success()
         return gpu_list
     except Exception as e:
-        logger.error(f"获取 GPU 列表失败: {e}")
+        _NVML_BACKOFF.record_failure("获取 GPU 列表失败", e)
         return []
 
 
 def get_gpu_info(device: "Device") -> Dict[str, Any]:
-    """获取单个 GPU 的详细信息"""
+    """获取单个 GPU 的详细信息（指标 + 进程）"""
+    gpu_info = get_gpu_metrics(device)
+    if "error" not in gpu_info:
+        gpu_info["processes"] = get_gpu_processes(device)
+    return gpu_info
+
+
+def get_gpu_metrics(device: "Device", timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    获取单个 GPU 的动态指标（显存、利用率、温度、功耗、时钟），不包含进程信息
+    
+    Args:
+        device: GPU 设备
+        timestamp: 本轮采集的时间戳，汇总采集时由调用方统一传入，未提供时取当前时间
+    """
     if not NVITOP_AVAILABLE:
         return {"error": "nvitop 未安装"}
     
+    if timestamp is None:
+        timestamp = datetime.now()
+    
     try:
+        bulk = _bulk_query(device)
+        static = _get_static_info(device, bulk["memory_total"])
+        
         # 基本信息
         gpu_info = {
             "index": device.index,
-            "name": _safe_value(device.name()),
-            "uuid": _safe_value(device.uuid()),
+            "name": static["name"],
+            "uuid": static["uuid"],
             
             # 显存信息
             "memory": {
-                "total": _safe_value(device.memory_total(), 0),
-                "used": _safe_value(device.memory_used(), 0),
-                "free": _safe_value(device.memory_free(), 0),
-                "percent": _safe_value(device.memory_percent(), 0),
-                "total_human": _safe_value(device.memory_total_human(), "N/A"),
-                "used_human": _safe_value(device.memory_used_human(), "N/A"),
-                "free_human": _safe_value(device.memory_free_human(), "N/A"),
+                "total": bulk["memory_total"],
+                "used": bulk["memory_used"],
+                "free": bulk["memory_free"],
+                "percent": bulk["memory_percent"],
+                "total_human": static["memory_total_human"],
+                "used_human": bytes2human(bulk["memory_used"]) if bulk["memory_total"] else "N/A",
+                "free_human": bytes2human(bulk["memory_free"]) if bulk["memory_total"] else "N/A",
             },
             
             # GPU 利用率
             "utilization": {
-                "gpu": _safe_value(device.gpu_utilization(), 0),
-                "memory": _safe_value(device.memory_utilization(), 0),
+                "gpu": bulk["gpu_util"],
+                "memory": bulk["memory_util"],
             },
             
             # 温度和功耗
             "temperature": _safe_value(device.temperature(), 0),
             "fan_speed": _safe_value(device.fan_speed(), 0),
-            "power": _get_power_info(device),
+            "power": _get_power_info(device, bulk),
             
             # 时钟频率
             "clocks": _get_clock_infos(device),
             
             # 驱动信息
-            "driver_version": _safe_value(device.driver_version(), "N/A"),
-            
-            # 进程信息
-            "processes": get_gpu_processes(device),
+            "driver_version": static["driver_version"],
             
             # 时间戳
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
         }
         
         return gpu_info
@@ -190,7 +415,7 @@ def get_gpu_info(device: "Device") -> Dict[str, Any]:
         return {
             "index": device.index if hasattr(device, 'index') else -1,
             "error": str(e),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
         }
 
 
@@ -205,24 +430,28 @@ def get_gpu_processes(device: "Device") -> List[Dict[str, Any]]:
         
         for pid, process in processes.items():
             try:
-                proc_info = {
-                    "pid": pid,
-                    "name": _safe_value(process.name(), "N/A"),
-                    "username": _safe_value(process.username(), "N/A"),
-                    "command": _safe_value(process.command(), "N/A"),
-                    "gpu_memory": _safe_value(process.gpu_memory(), 0),
-                    "gpu_memory_human": _safe_value(process.gpu_memory_human(), "N/A"),
-                    "gpu_memory_percent": _safe_value(process.gpu_memory_percent(), 0),
-                    "gpu_sm_utilization": _safe_value(process.gpu_sm_utilization(), 0),
-                    "gpu_encoder_utilization": _safe_value(process.gpu_encoder_utilization(), 0),
-                    "gpu_decoder_utilization": _safe_value(process.gpu_decoder_utilization(), 0),
-                    "cpu_percent": _safe_value(process.cpu_percent(), 0),
-                    "memory_percent": _safe_value(process.memory_percent(), 0),
-                    "running_time": _safe_value(process.running_time_human(), "N/A"),
-                    "type": _safe_value(process.type, "N/A"),
-                }
+                host = _HOST_PROCESSES.setdefault(pid, process.host)
+                # oneshot 内多个属性共享同一次 /proc 读取
+                with process.oneshot():
+                    proc_info = {
+                        "pid": pid,
+                        "name": _safe_value(process.name(), "N/A"),
+                        "username": _safe_value(process.username(), "N/A"),
+                        "command": _safe_value(process.command(), "N/A"),
+                        "gpu_memory": _safe_value(process.gpu_memory(), 0),
+                        "gpu_memory_human": _safe_value(process.gpu_memory_human(), "N/A"),
+                        "gpu_memory_percent": _safe_value(process.gpu_memory_percent(), 0),
+                        "gpu_sm_utilization": _safe_value(process.gpu_sm_utilization(), 0),
+                        "gpu_encoder_utilization": _safe_value(process.gpu_encoder_utilization(), 0),
+                        "gpu_decoder_utilization": _safe_value(process.gpu_decoder_utilization(), 0),
+                        "cpu_percent": _safe_value(host.cpu_percent(), 0),
+                        "memory_percent": _safe_value(process.memory_percent(), 0),
+                        "running_time": _safe_value(process.running_time_human(), "N/A"),
+                        "type": _safe_value(process.type, "N/A"),
+                    }
                 process_list.append(proc_info)
             except Exception as e:
+                _HOST_PROCESSES.pop(pid, None)
                 logger.warning(f"获取进程 {pid} 信息失败: {e}")
                 process_list.append({
                     "pid": pid,
@@ -235,44 +464,49 @@ def get_gpu_processes(device: "Device") -> List[Dict[str, Any]]:
         return []
 
 
+@_ttl_cached(GPU_PROCESS_POLL_INTERVAL_SECONDS)
+def _get_process_slices() -> Dict[int, List[Dict[str, Any]]]:
+    """按设备 index 采集各 GPU 的进程列表（独立于指标采集，使用较长的缓存时间）"""
+    if not NVITOP_AVAILABLE or _NVML_BACKOFF.blocked():
+        return {}
+    
+    try:
+        slices = {device.index: get_gpu_processes(device) for device in _get_devices()}
+        # 清理已不在任何 GPU 上运行的进程缓存
+        alive = {proc["pid"] for procs in slices.values() for proc in procs}
+        for pid in list(_HOST_PROCESSES):
+            if pid not in alive:
+                del _HOST_PROCESSES[pid]
+        return slices
+    except Exception as e:
+        _NVML_BACKOFF.record_failure("获取 GPU 进程列表失败", e)
+        return {}
+
+
 def get_all_gpu_processes() -> List[Dict[str, Any]]:
     """获取所有 GPU 上的进程（汇总）"""
-    if not NVITOP_AVAILABLE:
+    if not NVITOP_AVAILABLE or _NVML_BACKOFF.blocked():
         return []
     
     try:
         all_processes = []
-        devices = Device.all()
+        slices = _get_process_slices()
         
-        for device in devices:
-            processes = device.processes()
-            for pid, process in processes.items():
-                try:
-                    proc_info = {
-                        "gpu_index": device.index,
-                        "gpu_name": _safe_value(device.name(), "N/A"),
-                        "pid": pid,
-                        "name": _safe_value(process.name(), "N/A"),
-                        "username": _safe_value(process.username(), "N/A"),
-                        "command": _safe_value(process.command(), "N/A"),
-                        "gpu_memory": _safe_value(process.gpu_memory(), 0),
-                        "gpu_memory_human": _safe_value(process.gpu_memory_human(), "N/A"),
-                        "gpu_memory_percent": _safe_value(process.gpu_memory_percent(), 0),
-                        "gpu_sm_utilization": _safe_value(process.gpu_sm_utilization(), 0),
-                        "cpu_percent": _safe_value(process.cpu_percent(), 0),
-                        "memory_percent": _safe_value(process.memory_percent(), 0),
-                        "running_time": _safe_value(process.running_time_human(), "N/A"),
-                    }
-                    all_processes.append(proc_info)
-                except Exception as e:
-                    logger.warning(f"获取进程 {pid} 信息失败: {e}")
+        for device in _get_devices():
+            static = _STATIC_CACHE.get(device.index)
+            gpu_name = static["name"] if static is not None else _safe_value(device.name(), "N/A")
+            for proc in slices.get(device.index, []):
+                if "error" in proc:
+                    continue
+                all_processes.append({"gpu_index": device.index, "gpu_name": gpu_name, **proc})
         
         return all_processes
     except Exception as e:
-        logger.error(f"获取所有 GPU 进程失败: {e}")
+        _NVML_BACKOFF.record_failure("获取所有 GPU 进程失败", e)
         return []
 
 
+@_ttl_cached(GPU_POLL_INTERVAL_SECONDS)
 def get_gpu_summary() -> Dict[str, Any]:
     """获取 GPU 概要信息"""
     if not NVITOP_AVAILABLE:
@@ -281,11 +515,23 @@ def get_gpu_summary() -> Dict[str, Any]:
             "error": "nvitop 未安装，请运行: pip install nvitop",
             "gpu_count": 0,
             "gpus": [],
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
+        }
+    
+    if _NVML_BACKOFF.blocked():
+        return {
+            "available": False,
+            "error": f"NVML 连续访问失败，{_NVML_BACKOFF.remaining()} 秒后重试",
+            "gpu_count": 0,
+            "gpus": [],
+            "timestamp": datetime.now(),
         }
     
+    # 本轮采集的所有条目共用同一个时间戳
+    timestamp = datetime.now()
+    
     try:
-        devices = Device.all()
+        devices = _get_devices()
         gpu_count = len(devices)
         
         # 统计信息
@@ -294,19 +540,24 @@ def get_gpu_summary() -> Dict[str, Any]:
         total_processes = 0
         users = set()
         
-        gpus = []
-        for device in devices:
-            gpu_info = get_gpu_info(device)
-            gpus.append(gpu_info)
-            
-            total_memory += gpu_info["memory"]["total"]
-            used_memory += gpu_info["memory"]["used"]
-            total_processes += len(gpu_info["processes"])
-            
-            for proc in gpu_info["processes"]:
-                if proc.get("username") and proc["username"] != "N/A":
-                    users.add(proc["username"])
+        # 各设备的 NVML 查询在 C 扩展中释放 GIL，并行查询使总耗时取决于最慢的设备
+        if len(devices) > 1:
+            gpus = list(_get_query_executor().map(get_gpu_metrics, devices, [timestamp] * len(devices)))
+        else:
+            gpus = [get_gpu_metrics(device, timestamp) for device in devices]
+        
+        # 进程列表按自己的缓存周期刷新，这里合并最近一次的结果
+        process_slices = _get_process_slices()
         
+        for gpu_info in gpus:
+            procs = gpu_info["processes"] = process_slices.get(gpu_info["index"], [])
+            memory = gpu_info["memory"]
+            total_memory += memory["total"]
+            used_memory += memory["used"]
+            total_processes += len(procs)
+            users.update(p["username"] for p in procs if p.get("username") not in (None, "", "N/A"))
+        
+        _NVML_BACKOFF.record_success()
         return {
             "available": True,
             "gpu_count": gpu_count,
@@ -320,17 +571,33 @@ def get_gpu_summary() -> Dict[str, Any]:
             "active_user_count": len(users),
             "gpus": gpus,
             "host": get_host_info(),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
         }
     except Exception as e:
-        logger.error(f"获取 GPU 概要信息失败: {e}")
+        _NVML_BACKOFF.record_failure("获取 GPU 概要信息失败", e)
         return {
             "available": False,
             "error": str(e),
             "gpu_count": 0,
             "gpus": [],
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
+        }
+
+
+# nvitop 不可用时结果恒定（时间戳除外）：导入时直接替换为不经过缓存锁和异常处理的函数
+if not NVITOP_AVAILABLE:
+    def get_gpu_summary() -> Dict[str, Any]:
+        """nvitop 不可用时的 GPU 汇总信息（每次调用生成新的时间戳）"""
+        return {
+            "available": False,
+            "error": "nvitop 未安装，请运行: pip install nvitop",
+            "gpu_count": 0,
+            "gpus": [],
+            "timestamp": datetime.now(),
         }
+    
+    get_gpu_list = lambda: []  # noqa: E731
+    get_all_gpu_processes = lambda: []  # noqa: E731
 
 
 # 导出的函数
@@ -338,6 +605,7 @@ __all__ = [
     "get_gpu_summary",
     "get_gpu_list",
     "get_gpu_info",
+    "get_gpu_metrics",
     "get_gpu_processes",
     "get_all_gpu_processes",
     "get_host_info",
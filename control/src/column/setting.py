@@ -4,23 +4,95 @@
 用于管理 front_end/config.yaml 配置文件
 """
 
+import copy
+import io
+import os
 import logging
+import ipaddress
+import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+import yaml
 from ruamel.yaml import YAML
 
 logger = logging.getLogger(__name__)
 
+# 优先使用 libyaml 的 C 解析器，未编译 libyaml 时回退到纯 Python 实现
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _make_yaml() -> YAML:
+    """创建配置好的 ruamel 解析器（YAML 实例不是线程安全的，每次保存单独创建，不在线程间共享）"""
+    ryaml = YAML()
+    ryaml.preserve_quotes = True
+    ryaml.width = 4096
+    ryaml.default_flow_style = False
+    ryaml.map_indent = 2
+    ryaml.sequence_indent = 4
+    ryaml.sequence_dash_offset = 2
+    return ryaml
+
+
+@lru_cache(maxsize=32)
+def _is_valid_ip_address(ip: str) -> bool:
+    """验证 IP 地址格式（IPv4/IPv6），绑定地址取值有限，结果缓存复用"""
+    try:
+        ipaddress.ip_address(ip)
+        return True
+    except ValueError:
+        return False
+
+
+# 需要重启的设置项
+RESTART_REQUIRED = frozenset({'port', 'bind-address', 'gpu-poll-interval'})
+
+# 警告信息
+SETTING_WARNINGS = {
+    'port': "修改端口后，下次启动可能使用新端口",
+    'bind-address': "修改绑定地址后，下次启动可能使用新地址"
+}
+
+# 描述信息
+SETTING_DESCRIPTIONS = {
+    'target-yaml-path': "要操作的 YAML 文件路径（支持绝对路径和相对路径）",
+    'log-dir': "日志存储目录",
+    'port': "当前任务运行端口（如果冲突了自动换一个）",
+    'allow-lan': "允许来自局域网外部主机的访问",
+    'bind-address': "服务绑定地址",
+    'log-level': "日志级别",
+    'secret': "访问密钥（用于 API 认证）",
+    'gpu-poll-interval': "GPU 信息后台采集间隔（秒）"
+}
+
+
+def _build_setting_info(key: str) -> Mapping[str, Any]:
+    """构造设置项信息的只读映射"""
+    return MappingProxyType({
+        'key': key,
+        'requires_restart': key in RESTART_REQUIRED,
+        'warning': SETTING_WARNINGS.get(key),
+        'description': SETTING_DESCRIPTIONS.get(key)
+    })
+
 
 class SystemSettingsHandler:
     """系统设置处理器"""
     
-    def __init__(self, config_path: Path = None):
+    # 已知设置项的信息在导入时一次性构造
+    _INFO_TABLE = {
+        key: _build_setting_info(key)
+        for key in RESTART_REQUIRED | SETTING_WARNINGS.keys() | SETTING_DESCRIPTIONS.keys()
+    }
+    
+    def __init__(self, config_path: Path = None, initial_data: Optional[Dict[str, Any]] = None):
         """
         初始化设置处理器
         
         Args:
             config_path: config.yaml 文件路径，默认为 src/../config.yaml
+            initial_data: 调用方已解析好的设置数据，提供时直接作为缓存，避免重复解析
         """
         if config_path is None:
             # 默认路径：config 目录下的 control_setting.yaml
@@ -28,13 +100,19 @@ class SystemSettingsHandler:
         else:
             self.config_path = config_path
             
-        self.ryaml = YAML()
-        self.ryaml.preserve_quotes = True
-        self.ryaml.width = 4096
-        self.ryaml.default_flow_style = False
-        self.ryaml.map_indent = 2
-        self.ryaml.sequence_indent = 4
-        self.ryaml.sequence_dash_offset = 2
+        # 解析结果缓存：((mtime_ns, size), data)，文件未变化时跳过解析
+        self._cache = None
+        if initial_data is not None:
+            try:
+                st = self.config_path.stat()
+                self._cache = ((st.st_mtime_ns, st.st_size), initial_data)
+            except FileNotFoundError:
+                pass
+    
+    @property
+    def ryaml(self) -> YAML:
+        """保留注释的 ruamel 解析器（仅在保存时需要，每次访问创建新实例）"""
+        return _make_yaml()
     
     def load_settings(self) -> Dict[str, Any]:
         """
@@ -47,15 +125,24 @@ class SystemSettingsHandler:
             FileNotFoundError: 文件不存在
         """
         logger.info(f"读取系统设置: {self.config_path}")
-        if not self.config_path.is_file():
+        # 单次 stat 同时完成存在性检查和缓存校验
+        try:
+            st = self.config_path.stat()
+        except FileNotFoundError:
             logger.error(f"配置文件不存在: {self.config_path}")
             raise FileNotFoundError(f"配置文件不存在: {self.config_path}")
         
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._cache is not None and self._cache[0] == stamp:
+            return copy.deepcopy(self._cache[1])
+        
+        # 读取只需要数据本身，不需要保留注释，用 safe 解析器即可
         with self.config_path.open("r", encoding="utf-8") as f:
-            data = self.ryaml.load(f) or {}
+            data = yaml.load(f, Loader=YAML_LOADER) or {}
+        self._cache = (stamp, data)
         
         logger.info(f"成功读取设置，包含 {len(data)} 个顶级键")
-        return data
+        return copy.deepcopy(data)
     
     def save_settings(self, data: Dict[str, Any]) -> bool:
         """
@@ -67,27 +154,55 @@ class SystemSettingsHandler:
         Returns:
             是否保存成功
         """
+        tmp_path = None
         try:
             logger.info(f"保存系统设置: {self.config_path}")
             
-            # 备份原文件
-            backup_path = self.config_path.with_suffix('.yaml.backup')
-            if self.config_path.exists():
-                import shutil
-                shutil.copy2(self.config_path, backup_path)
-                logger.info(f"已备份原配置文件到: {backup_path}")
+            # 原文件只读取一次，解析、备份和变更比较都基于这份内容
+            original_text = self.config_path.read_text(encoding="utf-8")
             
-            # 读取原文件以保留注释
-            with self.config_path.open("r", encoding="utf-8") as f:
-                original_data = self.ryaml.load(f) or {}
+            # 只有文件含注释时才需要 ruamel 往返解析来保留注释，否则用更快的 safe_load/safe_dump
+            has_comments = "#" in original_text
+            if has_comments:
+                ryaml = self.ryaml  # 本次保存的解析和输出共用一个实例
+                original_data = ryaml.load(original_text) or {}
+            else:
+                original_data = yaml.safe_load(original_text) or {}
             
             # 更新数据，保留原有的注释
             for key, value in data.items():
                 original_data[key] = value
             
-            # 保存配置（保留注释）
-            with self.config_path.open("w", encoding="utf-8") as f:
-                self.ryaml.dump(original_data, f)
+            if has_comments:
+                buf = io.StringIO()
+                ryaml.dump(original_data, buf)
+                new_text = buf.getvalue()
+            else:
+                new_text = yaml.safe_dump(original_data, allow_unicode=True, sort_keys=False)
+            
+            # 内容未变化时不备份也不重写
+            if new_text == original_text:
+                logger.info("系统设置未变化，跳过保存")
+                return True
+            
+            # 备份原文件（直接写入已读取的内容，无需再复制文件）
+            backup_path = self.config_path.with_suffix('.yaml.backup')
+            backup_path.write_text(original_text, encoding="utf-8")
+            logger.info(f"已备份原配置文件到: {backup_path}")
+            
+            # 先写临时文件再原子替换，避免写入中途失败留下不完整的配置；
+            # 每次保存使用独立的临时文件，并发保存互不覆盖
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{self.config_path.name}.", suffix=".tmp",
+                                            dir=self.config_path.parent)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(new_text)
+            os.chmod(tmp_path, 0o644)  # mkstemp 创建的文件权限为 0600
+            os.replace(tmp_path, self.config_path)
+            tmp_path = None
+            
+            # 直接用合并后的数据刷新缓存，下次读取无需重新解析
+            st = self.config_path.stat()
+            self._cache = ((st.st_mtime_ns, st.st_size), original_data)
             
             logger.info("系统设置保存成功")
             return True
@@ -95,6 +210,13 @@ class SystemSettingsHandler:
         except Exception as e:
             logger.error(f"保存系统设置失败: {e}")
             return False
+        finally:
+            # 保存失败时清理临时文件
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
     
     def validate_settings(self, data: Dict[str, Any]) -> Dict[str, str]:
         """
@@ -132,19 +254,9 @@ class SystemSettingsHandler:
     
     def _is_valid_ip(self, ip: str) -> bool:
         """验证 IP 地址格式"""
-        try:
-            parts = ip.split('.')
-            if len(parts) != 4:
-                return False
-            for part in parts:
-                num = int(part)
-                if num < 0 or num > 255:
-                    return False
-            return True
-        except ValueError:
-            return False
+        return isinstance(ip, str) and _is_valid_ip_address(ip)
     
-    def get_setting_info(self, key: str) -> Dict[str, Any]:
+    def get_setting_info(self, key: str) -> Mapping[str, Any]:
         """
         获取特定设置项的信息
         
@@ -152,54 +264,28 @@ class SystemSettingsHandler:
             key: 设置项键名
             
         Returns:
-            设置项信息字典
+            设置项信息（只读映射，同一键的多次调用共享同一对象）
         """
-        info = {
-            'key': key,
-            'requires_restart': False,
-            'warning': None,
-            'description': None
-        }
-        
-        # 需要重启的设置项
-        restart_required = ['port', 'bind-address']
-        if key in restart_required:
-            info['requires_restart'] = True
-        
-        # 警告信息
-        warnings = {
-            'port': "修改端口后，下次启动可能使用新端口",
-            'bind-address': "修改绑定地址后，下次启动可能使用新地址"
-        }
-        info['warning'] = warnings.get(key)
-        
-        # 描述信息
-        descriptions = {
-            'target-yaml-path': "要操作的 YAML 文件路径（支持绝对路径和相对路径）",
-            'log-dir': "日志存储目录",
-            'port': "当前任务运行端口（如果冲突了自动换一个）",
-            'allow-lan': "允许来自局域网外部主机的访问",
-            'bind-address': "服务绑定地址",
-            'log-level': "日志级别",
-            'secret': "访问密钥（用于 API 认证）"
-        }
-        info['description'] = descriptions.get(key)
-        
+        info = self._INFO_TABLE.get(key)
+        if info is None:
+            info = _build_setting_info(key)
         return info
 
 
 # 创建默认实例
-def create_settings_handler(config_path: Path = None) -> SystemSettingsHandler:
+def create_settings_handler(config_path: Path = None,
+                            initial_data: Optional[Dict[str, Any]] = None) -> SystemSettingsHandler:
     """
     创建设置处理器实例
     
     Args:
         config_path: 配置文件路径
+        initial_data: 已解析的设置数据（可选）
         
     Returns:
         设置处理器实例
     """
-    return SystemSettingsHandler(config_path)
+    return SystemSettingsHandler(config_path, initial_data)
 
 
 # 导出的函数
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 import os
 import sys
+import hmac
+import json
+import time
+import asyncio
 import yaml
 import logging
 from pathlib import Path
@@ -8,37 +12,55 @@ from typing import Any, Dict, Optional
 from datetime import datetime
 
 from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
+try:
+    # orjson 序列化比标准库 json 快数倍，未安装时回退到默认的 JSONResponse
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401  ORJSONResponse 在实例化时才检查 orjson
+    DEFAULT_RESPONSE_CLASS = ORJSONResponse
+except ImportError:
+    DEFAULT_RESPONSE_CLASS = JSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
 
 # 导入自定义模块
 from column.config_rule import create_yaml_handler
-from column.manage_gpu import get_gpu_summary, get_all_gpu_processes, NVITOP_AVAILABLE
+from column.manage_gpu import get_gpu_summary, get_all_gpu_processes, NVITOP_AVAILABLE, GPU_POLL_INTERVAL_SECONDS
+from column.gpu_poller import get_gpu_poller
 from column.setting import create_settings_handler
 from column.config_command import create_command_handler
+from column.display_state import get_state_manager
 from utils.manage_port import (
     find_available_port, log_port_change, validate_port_range,
     register_process_info, unregister_process_info, cleanup_pid_file
 )
 from utils.run_app import get_app_runner
 
+# 优先使用 libyaml 的 C 解析器，未编译 libyaml 时回退到纯 Python 实现
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 路径在导入时一次性解析，请求处理过程中不再重复拼接
+SRC_DIR = Path(__file__).parent
+CONFIG_FILE_PATH = str(SRC_DIR.parent.parent / "config" / "control_setting.yaml")
+
 # 读取配置文件
 def load_settings() -> Dict[str, Any]:
     """读取 control_setting.yaml 配置文件"""
-    config_file = Path(__file__).parent.parent.parent / "config" / "control_setting.yaml"
-    if not config_file.is_file():
-        raise FileNotFoundError(f"配置文件不存在: {config_file}")
-    with config_file.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+    try:
+        with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
+            return yaml.load(f, Loader=YAML_LOADER) or {}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"配置文件不存在: {CONFIG_FILE_PATH}")
 
 # 从配置文件加载设置
 settings = load_settings()
 
 # 根据配置设置常量
-TARGET_YAML_PATH = Path(__file__).parent.parent / settings["target-yaml-path"]
-STATIC_DIR = Path(__file__).parent / "dashboard" / "dist"
-LOG_DIR = Path(__file__).parent.parent / "logs"  # 修改为使用 front_end/logs
+TARGET_YAML_PATH = SRC_DIR.parent / settings["target-yaml-path"]
+STATIC_DIR = SRC_DIR / "dashboard" / "dist"
+ASSETS_DIR = str(STATIC_DIR / "assets")
+IMAGES_DIR = str(STATIC_DIR / "images")
+LOG_DIR = SRC_DIR.parent / "logs"  # 修改为使用 front_end/logs
 
 # 端口处理 - 检测冲突并自动选择可用端口
 CONFIG_PORT = settings.get("port", 29214)
@@ -58,6 +80,11 @@ PORT = actual_port
 ALLOW_LAN = settings.get("allow-lan", True)
 LOG_LEVEL = settings.get("log-level", "info")
 SECRET = settings.get("secret", "admin")  # 访问密钥
+# 密钥在运行期间不变，启动时一次性确定是否需要认证
+NO_AUTH_SECRETS = frozenset({"none", "null", "false"})
+REQUIRES_AUTH = not (SECRET == "" or str(SECRET).lower() in NO_AUTH_SECRETS)
+# 预先编码密钥，登录时用 hmac.compare_digest 做恒定时间比较（其 str 参数仅支持 ASCII，统一比较 UTF-8 字节）
+SECRET_BYTES = str(SECRET).encode("utf-8")
 
 # 设置日志
 def setup_logging():
@@ -80,9 +107,12 @@ logger = setup_logging()
 
 # 创建处理器
 yaml_handler = create_yaml_handler(TARGET_YAML_PATH)
-settings_handler = create_settings_handler()
+# 复用启动时已解析的设置，处理器不再重复解析同一文件
+settings_handler = create_settings_handler(Path(CONFIG_FILE_PATH), initial_data=settings)
 command_handler = create_command_handler()
 app_runner = get_app_runner()
+state_manager = get_state_manager()
+gpu_poller = get_gpu_poller(float(settings.get("gpu-poll-interval", GPU_POLL_INTERVAL_SECONDS)))
 
 # 读取配置函数
 def load_config() -> Dict[str, Any]:
@@ -104,12 +134,15 @@ app = FastAPI(
     title="Config Editor API",
     description="API to read/write config.yaml",
     version="1.0.0",
+    default_response_class=DEFAULT_RESPONSE_CLASS,
 )
 
 # 注意：SECRET 已在第 59 行从 front_end/config.yaml 读取
 
 # 数据模型（用于校验 GPU 配置）
 class ConfigModel(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     check_time: int
     maximize_resource_utilization: bool
     compete_gpus: list
@@ -121,8 +154,8 @@ class ConfigModel(BaseModel):
     gpu_command_file: str
     gpus_command_file: str
 
-    class Config:
-        allow_population_by_field_name = True
+# 校验器在模块加载时构建一次，请求中直接调用
+CONFIG_ADAPTER = TypeAdapter(ConfigModel)
 
 @app.get("/api/config")
 def get_config():
@@ -137,29 +170,26 @@ def get_config():
         logger.error(f"获取配置失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 认证需求和 nvitop 可用性在运行期间不变，响应体在启动时预先序列化
+AUTH_CHECK_BODY = json.dumps({"requires_auth": REQUIRES_AUTH}).encode()
+CONSTANT_CACHE_HEADERS = {"Cache-Control": "max-age=5"}
+
 @app.get("/api/auth/check")
-def check_auth():
+async def check_auth():
     """检查是否需要认证"""
-    try:
-        logger.info("收到认证检查请求")
-        if SECRET == "" or SECRET.lower() in ["none", "null", "false"]:
-            return {"requires_auth": False}
-        else:
-            return {"requires_auth": True}
-    except Exception as e:
-        logger.error(f"检查认证失败: {e}")
-        return {"requires_auth": True}
+    logger.info("收到认证检查请求")
+    return Response(content=AUTH_CHECK_BODY, media_type="application/json", headers=CONSTANT_CACHE_HEADERS)
 
 @app.post("/api/auth/login")
-def login(login_data: dict):
+async def login(login_data: dict):
     """登录验证"""
     try:
         logger.info("收到登录请求")
         password = login_data.get("password", "")
         
-        if SECRET == "" or SECRET.lower() in ["none", "null", "false"]:
+        if not REQUIRES_AUTH:
             return {"success": True, "message": "无需认证"}
-        elif password == SECRET:
+        elif isinstance(password, str) and hmac.compare_digest(password.encode("utf-8"), SECRET_BYTES):
             return {"success": True, "message": "登录成功"}
         else:
             return {"success": False, "message": "密码错误"}
@@ -175,7 +205,7 @@ def update_config(data: Dict[str, Any]):
         
         # 校验数据
         try:
-            validated_data = ConfigModel(**data).model_dump()
+            validated_data = CONFIG_ADAPTER.validate_python(data).model_dump()
         except ValidationError as e:
             logger.error(f"参数校验失败: {e}")
             raise HTTPException(status_code=400, detail=f"参数校验失败: {e}")
@@ -194,13 +224,30 @@ def update_config(data: Dict[str, Any]):
 
 # ==================== GPU 管理 API ====================
 
+@app.on_event("startup")
+def start_gpu_poller():
+    """启动 GPU 信息后台采集（nvitop 不可用时结果恒定，无需采集）"""
+    if NVITOP_AVAILABLE:
+        gpu_poller.start()
+
+
+@app.on_event("shutdown")
+def stop_gpu_poller():
+    """停止 GPU 信息后台采集"""
+    gpu_poller.stop()
+
+
 @app.get("/api/gpu")
 def get_gpu_info_api():
-    """获取 GPU 概要信息（类似 nvitop）"""
+    """获取 GPU 概要信息（类似 nvitop），直接返回后台采集的最新结果"""
     try:
         logger.info("收到获取 GPU 信息请求")
-        summary = get_gpu_summary()
-        return summary
+        body = gpu_poller.latest_json
+        if body is None:
+            # 首次采集尚未完成时同步采集一次
+            return get_gpu_summary()
+        # 采集线程已序列化好结果，直接返回字节，跳过逐请求的 jsonable_encoder 与序列化
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         logger.error(f"获取 GPU 信息失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -218,13 +265,21 @@ def get_gpu_processes_api():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# GPU 状态响应按秒缓存：同一秒内的健康检查复用同一份序列化结果
+_gpu_status_cache = (None, b"")
+
 @app.get("/api/gpu/status")
-def get_gpu_status_api():
+async def get_gpu_status_api():
     """获取 GPU 监控状态（无需认证，用于健康检查）"""
-    return {
-        "nvitop_available": NVITOP_AVAILABLE,
-        "timestamp": datetime.now().isoformat(),
-    }
+    global _gpu_status_cache
+    second = int(time.time())
+    if _gpu_status_cache[0] != second:
+        body = json.dumps({
+            "nvitop_available": NVITOP_AVAILABLE,
+            "timestamp": datetime.now().isoformat(),
+        }).encode()
+        _gpu_status_cache = (second, body)
+    return Response(content=_gpu_status_cache[1], media_type="application/json", headers=CONSTANT_CACHE_HEADERS)
 
 # ==================== 命令配置 API ====================
 
@@ -437,7 +492,7 @@ def stop_scheduler_api(mode: str, config_index: int = 0):
 
 
 @app.get("/api/scheduler/{mode}/status")
-def get_scheduler_status_api(mode: str, config_index: int = 0):
+async def get_scheduler_status_api(mode: str, config_index: int = 0):
     """获取调度器状态"""
     try:
         if mode not in ["single", "multi"]:
@@ -451,7 +506,7 @@ def get_scheduler_status_api(mode: str, config_index: int = 0):
 
 
 @app.get("/api/scheduler/status")
-def get_all_scheduler_status_api():
+async def get_all_scheduler_status_api():
     """获取所有调度器状态"""
     try:
         status = app_runner.get_all_status()
@@ -462,12 +517,11 @@ def get_all_scheduler_status_api():
 
 
 @app.get("/api/scheduler/running")
-def get_running_schedulers_api():
+async def get_running_schedulers_api():
     """获取所有正在运行的调度器详细状态（从状态文件读取）"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
-        schedulers = state_manager.get_all_scheduler_status()
+        # 读取状态文件涉及磁盘 I/O，放到线程中执行
+        schedulers = await asyncio.to_thread(state_manager.get_all_scheduler_status)
         return {"schedulers": schedulers}
     except Exception as e:
         logger.error(f"获取运行中调度器状态失败: {e}")
@@ -478,8 +532,6 @@ def get_running_schedulers_api():
 def stop_scheduler_by_pid_api(pid: int):
     """通过 PID 停止调度器"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         result = state_manager.stop_scheduler(pid)
         
         if not result["success"]:
@@ -499,8 +551,6 @@ def stop_scheduler_by_pid_api(pid: int):
 def bind_log_api(mode: str, config_index: int, queue_id: int, process_index: int, log_path: str):
     """绑定日志文件"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         result = state_manager.bind_log(mode, config_index, queue_id, process_index, log_path)
         
         if not result["success"]:
@@ -518,8 +568,6 @@ def bind_log_api(mode: str, config_index: int, queue_id: int, process_index: int
 def unbind_log_api(mode: str, config_index: int, queue_id: int, process_index: int):
     """解除日志绑定"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         result = state_manager.unbind_log(mode, config_index, queue_id, process_index)
         return result
     except Exception as e:
@@ -528,11 +576,9 @@ def unbind_log_api(mode: str, config_index: int, queue_id: int, process_index: i
 
 
 @app.get("/api/log/bindings")
-def get_log_bindings_api():
+async def get_log_bindings_api():
     """获取所有日志绑定"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         return state_manager.get_all_log_bindings()
     except Exception as e:
         logger.error(f"获取日志绑定失败: {e}")
@@ -543,8 +589,6 @@ def get_log_bindings_api():
 def read_log_content_api(mode: str, config_index: int, queue_id: int, process_index: int, tail_lines: int = 100):
     """读取日志内容"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         result = state_manager.read_log_content(mode, config_index, queue_id, process_index, tail_lines)
         return result
     except Exception as e:
@@ -556,8 +600,6 @@ def read_log_content_api(mode: str, config_index: int, queue_id: int, process_in
 def read_log_by_path_api(log_path: str, tail_lines: int = 100):
     """通过路径读取日志"""
     try:
-        from column.display_state import get_state_manager
-        state_manager = get_state_manager()
         result = state_manager.read_log_by_path(log_path, tail_lines)
         return result
     except Exception as e:
@@ -568,11 +610,12 @@ def read_log_by_path_api(log_path: str, tail_lines: int = 100):
 # ==================== 系统设置 API ====================
 
 @app.get("/api/settings")
-def get_settings_api():
+async def get_settings_api():
     """获取系统设置"""
     try:
         logger.info("收到获取系统设置请求")
-        settings_data = settings_handler.load_settings()
+        # 只有读取/解析文件放到线程中执行，设置项信息查表直接在事件循环中完成
+        settings_data = await asyncio.to_thread(settings_handler.load_settings)
         
         # 添加设置项信息
         settings_with_info = {}
@@ -592,7 +635,7 @@ def get_settings_api():
 
 
 @app.put("/api/settings")
-def update_settings_api(settings_data: dict):
+async def update_settings_api(settings_data: dict):
     """更新系统设置"""
     try:
         logger.info("收到更新系统设置请求")
@@ -606,25 +649,26 @@ def update_settings_api(settings_data: dict):
             )
         
         # 保存设置
-        success = settings_handler.save_settings(settings_data)
+        success = await asyncio.to_thread(settings_handler.save_settings, settings_data)
         if not success:
             raise HTTPException(status_code=500, detail="保存设置失败")
         
-        # 检查需要重启的设置项
+        # 检查需要重启的设置项及警告信息
         restart_settings = []
+        warnings = []
         for key in settings_data:
             info = settings_handler.get_setting_info(key)
             if info["requires_restart"]:
                 restart_settings.append(key)
+            if info["warning"]:
+                warnings.append(info["warning"])
         
         logger.info(f"系统设置更新成功，需要重启的设置: {restart_settings}")
         
         return {
             "message": "设置保存成功",
             "requires_restart": restart_settings,
-            "warnings": [settings_handler.get_setting_info(k)["warning"] 
-                       for k in settings_data 
-                       if settings_handler.get_setting_info(k)["warning"]]
+            "warnings": warnings
         }
     except HTTPException:
         raise
@@ -633,34 +677,90 @@ def update_settings_api(settings_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 # 静态文件服务（前端构建产物）
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+# index.html 内容缓存的重新校验间隔（秒）：只在间隔到期后 stat 一次，mtime 变化（重新构建前端）时重新读取
+INDEX_RECHECK_SECONDS = 5.0
+
+
+class SPAStaticFiles(StaticFiles):
+    """前端 SPA 静态文件服务：找不到的路径回退到 index.html，由前端路由处理"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index_path = Path(self.directory) / "index.html"
+        # (上次校验时间, mtime_ns, ETag, 内容)
+        self._index_cache = None
+
+    def _load_index(self):
+        """返回缓存的 index.html (ETag, 内容)，到期后按 mtime 判断是否需要重新读取"""
+        now = time.monotonic()
+        cache = self._index_cache
+        if cache is not None and now - cache[0] < INDEX_RECHECK_SECONDS:
+            return cache[2], cache[3]
+        try:
+            st = self._index_path.stat()
+            if cache is not None and cache[1] == st.st_mtime_ns:
+                self._index_cache = (now, cache[1], cache[2], cache[3])
+                return cache[2], cache[3]
+            content = self._index_path.read_bytes()
+        except FileNotFoundError:
+            # 前端构建产物缺失（或正在重新构建）时返回 404，而不是读取失败导致 500
+            self._index_cache = None
+            raise HTTPException(status_code=404, detail="index.html 不存在")
+        etag = f'"{st.st_mtime_ns:x}-{len(content):x}"'
+        self._index_cache = (now, st.st_mtime_ns, etag, content)
+        return etag, content
+
+    def _index_response(self, scope) -> Response:
+        """从内存返回 index.html，每次都需向服务端校验（no-cache + ETag）"""
+        etag, content = self._load_index()
+        headers = {"Cache-Control": "no-cache", "ETag": etag}
+        if Headers(scope=scope).get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=content, media_type="text/html", headers=headers)
+
+    async def get_response(self, path: str, scope):
+        if path in ("index.html", "."):
+            return self._index_response(scope)
+        try:
+            return await super().get_response(path, scope)
+        except StarletteHTTPException as e:
+            if e.status_code != 404:
+                raise
+            return self._index_response(scope)
+
 
 if STATIC_DIR.is_dir():
-    # 挂载静态资源（CSS、JS等）
-    app.mount("/ui/assets", StaticFiles(directory=str(STATIC_DIR / "assets")), name="assets")
+    # 挂载静态资源（CSS、JS等），缺失的资源直接返回 404 而不是回退到 index.html
+    app.mount("/ui/assets", StaticFiles(directory=ASSETS_DIR), name="assets")
     
     # 挂载图片资源
-    images_dir = STATIC_DIR / "images"
-    if images_dir.is_dir():
-        app.mount("/ui/images", StaticFiles(directory=str(images_dir)), name="images")
+    if os.path.isdir(IMAGES_DIR):
+        app.mount("/ui/images", StaticFiles(directory=IMAGES_DIR), name="images")
     
     # 根路径重定向到 /ui/
     @app.get("/")
-    def redirect_to_ui():
+    async def redirect_to_ui():
         return RedirectResponse(url="/ui/")
     
-    # SPA 路由处理 - 所有 /ui/* 路径都返回 index.html
-    @app.get("/ui/{full_path:path}")
-    def serve_spa(full_path: str):
-        index_file = STATIC_DIR / "index.html"
-        if index_file.is_file():
-            return HTMLResponse(content=index_file.read_text(encoding="utf-8"))
-        return {"detail": "index.html not found"}
+    # SPA 路由处理 - /ui/* 下存在的文件直接返回，其余路径都返回 index.html
+    app.mount("/ui", SPAStaticFiles(directory=str(STATIC_DIR), html=True), name="ui")
 else:
     @app.get("/")
-    def read_root():
+    async def read_root():
         return {"message": "前端构建产物不存在，请先在 front_end 目录下运行 npm run build"}
 
+# 所有路由注册完成后，若安装了 fastapi_radixer 则替换为基数树路由匹配，否则沿用 Starlette 默认路由
+try:
+    from fastapi_radixer import init_app as init_radix_router
+    init_radix_router(app)
+    logger.info("已启用基数树路由")
+except ImportError:
+    pass
+
 if __name__ == "__main__":
     import uvicorn
     import atexit
@@ -686,5 +786,11 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)
     
-    # 使用配置文件中的端口设置
-    uvicorn.run(app, host=BIND_ADDRESS, port=PORT)
\ No newline at end of file
+    # 优先使用 uvloop 事件循环和 httptools 解析器，未安装时回退到默认实现
+    import importlib.util
+    loop_impl = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http_impl = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    logger.info(f"事件循环: {loop_impl}, HTTP 解析器: {http_impl}")
+    
+    # 使用配置文件中的端口设置（请求日志已由各接口自行记录，关闭 access log）
+    uvicorn.run(app, host=BIND_ADDRESS, port=PORT, loop=loop_impl, http=http_impl, access_log=False)
\ No newline at end of file
@@ -8,29 +8,57 @@ import socket
 import logging
 import os
 import json
+import fcntl
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from contextlib import contextmanager
+from typing import Optional, Set, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 # 获取项目根目录（相对路径）
 FRONT_END_DIR = Path(__file__).parent.parent.parent  # front_end 目录
 PID_FILE = FRONT_END_DIR / "logs" / "pid.json"
+PID_LOCK_FILE = FRONT_END_DIR / "logs" / "pid.json.lock"
 
 
 def is_port_available(port: int, host: str = "0.0.0.0") -> bool:
-    """检查指定端口是否可用"""
+    """检查指定端口是否可用（尝试 bind，成功即表示端口空闲）"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
             sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            result = sock.connect_ex((host, port))
-            return result != 0
+            sock.bind((host, port))
+            return True
+    except OSError:
+        return False
     except Exception as e:
         logger.warning(f"检查端口 {port} 时发生错误: {e}")
         return False
 
 
+def _get_listening_ports() -> Set[int]:
+    """获取当前处于 LISTEN 状态的端口集合（psutil 不可用时返回空集合）"""
+    try:
+        import psutil
+        return {
+            conn.laddr.port
+            for conn in psutil.net_connections(kind="inet")
+            if conn.status == psutil.CONN_LISTEN and conn.laddr
+        }
+    except ImportError:
+        return set()
+    except Exception as e:
+        logger.debug(f"获取监听端口列表失败: {e}")
+        return set()
+
+
 def find_available_port(start_port: int, host: str = "0.0.0.0", max_attempts: int = 100) -> Tuple[int, int]:
     """从指定端口开始查找可用端口，返回 (原始端口, 实际端口)"""
     original_port = start_port
@@ -41,7 +69,12 @@ def find_available_port(start_port: int, host: str = "0.0.0.0", max_attempts: in
     
     logger.warning(f"端口 {start_port} 被占用，开始查找可用端口...")
     
+    # 一次性获取所有监听端口，跳过已知被占用的端口，只对候选端口做 bind 检查
+    listening_ports = _get_listening_ports()
+    
     for port in range(start_port + 1, start_port + max_attempts + 1):
+        if port in listening_ports:
+            continue
         if is_port_available(port, host):
             logger.info(f"找到可用端口: {port} (原端口: {start_port})")
             return original_port, port
@@ -66,8 +99,78 @@ def get_local_ip() -> str:
         return "127.0.0.1"
 
 
+# /proc/net/tcp 中 st 列的十六进制状态码与 psutil 状态名的对应关系
+_TCP_STATES = {
+    '01': 'ESTABLISHED', '02': 'SYN_SENT', '03': 'SYN_RECV', '04': 'FIN_WAIT1',
+    '05': 'FIN_WAIT2', '06': 'TIME_WAIT', '07': 'CLOSE', '08': 'CLOSE_WAIT',
+    '09': 'LAST_ACK', '0A': 'LISTEN', '0B': 'CLOSING',
+}
+
+
+def _decode_proc_address(hex_addr: str) -> str:
+    """将 /proc/net/tcp 中的十六进制地址（按 32 位小端存储）解码为可读 IP"""
+    raw = bytes.fromhex(hex_addr)
+    raw = b''.join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    family = socket.AF_INET if len(raw) == 4 else socket.AF_INET6
+    return socket.inet_ntop(family, raw)
+
+
+def _find_port_socket(port: int) -> Optional[Tuple[str, str, str]]:
+    """在 /proc/net/tcp(6) 中查找本地端口为 port 的套接字，返回 (inode, 状态, 地址)"""
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table, 'r') as f:
+                next(f, None)  # 跳过表头
+                for line in f:
+                    fields = line.split()
+                    addr, _, hex_port = fields[1].rpartition(':')
+                    if int(hex_port, 16) == port:
+                        return fields[9], _TCP_STATES.get(fields[3], fields[3]), _decode_proc_address(addr)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _find_pid_by_inode(inode: str) -> Optional[int]:
+    """扫描 /proc/*/fd 查找持有指定 socket inode 的进程（无权限的进程会被跳过）"""
+    target = f'socket:[{inode}]'
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        fd_dir = f'/proc/{name}/fd'
+        try:
+            for fd in os.listdir(fd_dir):
+                if os.readlink(f'{fd_dir}/{fd}') == target:
+                    return int(name)
+        except OSError:
+            continue
+    return None
+
+
+def _get_port_info_proc(port: int) -> Optional[dict]:
+    """Linux 下直接解析 /proc 获取端口占用信息，只对匹配端口解析进程"""
+    found = _find_port_socket(port)
+    if found is None:
+        return None
+    inode, state, address = found
+    pid = _find_pid_by_inode(inode)
+    try:
+        with open(f'/proc/{pid}/comm', 'r') as f:
+            name = f.read().strip()
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read().replace(b'\0', b' ').decode(errors='replace').strip()
+    except (OSError, TypeError):
+        name, cmdline = 'unknown', 'unknown'
+    return {'pid': pid, 'name': name, 'cmdline': cmdline, 'status': state, 'address': address}
+
+
 def get_port_info(port: int) -> Optional[dict]:
     """获取端口占用信息"""
+    if os.path.isdir('/proc/net'):
+        try:
+            return _get_port_info_proc(port)
+        except Exception as e:
+            logger.debug(f"解析 /proc 获取端口 {port} 信息失败，回退到 psutil: {e}")
     try:
         import psutil
         for conn in psutil.net_connections():
@@ -120,42 +223,93 @@ def is_process_running(pid: int) -> bool:
         return False
 
 
+def _live_pids() -> Optional[Set[int]]:
+    """一次性获取当前存活的 PID 集合（Linux 读 /proc，其他平台用 psutil.pids()，均不可用时返回 None）"""
+    try:
+        return {int(name) for name in os.listdir('/proc') if name.isdigit()}
+    except OSError:
+        pass
+    try:
+        import psutil
+        return set(psutil.pids())
+    except ImportError:
+        return None
+
+
+def _filter_running(instances: list) -> list:
+    """过滤出进程仍在运行的实例（批量判断，避免逐个 os.kill 探测）"""
+    live = _live_pids()
+    if live is None:
+        return [inst for inst in instances if is_process_running(inst.get('pid', 0))]
+    return [inst for inst in instances if inst.get('pid', 0) in live]
+
+
+@contextmanager
+def _locked_pid_file():
+    """对 pid.json 加排他锁（锁文件独立，保证多实例并发读改写不会互相覆盖）"""
+    PID_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(PID_LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_instances() -> list:
+    """读取 pid.json 中的实例列表（文件不存在或损坏时返回空列表）"""
+    try:
+        if ORJSON_AVAILABLE:
+            with open(PID_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(PID_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+    except FileNotFoundError:
+        return []
+    except ValueError:  # json.JSONDecodeError / orjson.JSONDecodeError 均为 ValueError 子类
+        return []
+    if isinstance(data, dict) and isinstance(data.get('instances'), list):
+        return data['instances']
+    return []
+
+
+def _write_instances(instances: list):
+    """原子写入 pid.json（先写临时文件再 os.replace，读取方不会看到半写入的内容）"""
+    tmp_file = PID_FILE.with_name(PID_FILE.name + '.tmp')
+    if ORJSON_AVAILABLE:
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps({"instances": instances}, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"instances": instances}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, PID_FILE)
+
+
 def register_process_info(port: int, host: str = "0.0.0.0") -> bool:
     """将当前进程的 PID 和端口信息写入 pid.json 文件"""
     try:
         pid = os.getpid()
         local_ip = get_local_ip()
+        now = datetime.now()
         
-        PID_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
-        instances = []
-        if PID_FILE.exists():
-            try:
-                with open(PID_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and 'instances' in data:
-                        instances = data['instances']
-            except (json.JSONDecodeError, KeyError):
-                instances = []
-        
-        # 清理已停止的进程
-        instances = [inst for inst in instances if is_process_running(inst.get('pid', 0))]
-        
-        # 添加当前进程信息
-        process_info = {
-            "instance": len(instances) + 1,
-            "pid": pid,
-            "port": port,
-            "host": host,
-            "ip": local_ip,
-            "url": f"http://{local_ip}:{port}",
-            "start_time": datetime.now().isoformat(),
-            "start_timestamp": int(datetime.now().timestamp())
-        }
-        instances.append(process_info)
-        
-        with open(PID_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"instances": instances}, f, indent=2, ensure_ascii=False)
+        with _locked_pid_file():
+            # 清理已停止的进程
+            instances = _filter_running(_read_instances())
+            
+            # 添加当前进程信息
+            process_info = {
+                "instance": len(instances) + 1,
+                "pid": pid,
+                "port": port,
+                "host": host,
+                "ip": local_ip,
+                "url": f"http://{local_ip}:{port}",
+                "start_time": now.isoformat(),
+                "start_timestamp": int(now.timestamp())
+            }
+            instances.append(process_info)
+            _write_instances(instances)
         
         logger.info(f"进程信息已注册: PID={pid}, Port={port}, URL=http://{local_ip}:{port}")
         return True
@@ -171,13 +325,11 @@ def unregister_process_info() -> bool:
         if not PID_FILE.exists():
             return True
         
-        with open(PID_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if isinstance(data, dict) and 'instances' in data:
-            instances = [inst for inst in data['instances'] if inst.get('pid') != pid]
-            with open(PID_FILE, 'w', encoding='utf-8') as f:
-                json.dump({"instances": instances}, f, indent=2, ensure_ascii=False)
+        with _locked_pid_file():
+            instances = _read_instances()
+            remaining = [inst for inst in instances if inst.get('pid') != pid]
+            if len(remaining) != len(instances):
+                _write_instances(remaining)
         
         logger.info(f"进程信息已注销: PID={pid}")
         return True
@@ -192,20 +344,15 @@ def cleanup_pid_file() -> bool:
         if not PID_FILE.exists():
             return True
         
-        with open(PID_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if isinstance(data, dict) and 'instances' in data:
-            instances = data['instances']
-            active = [inst for inst in instances if is_process_running(inst.get('pid', 0))]
+        with _locked_pid_file():
+            instances = _read_instances()
+            active = _filter_running(instances)
             for i, inst in enumerate(active, 1):
                 inst['instance'] = i
-            
-            with open(PID_FILE, 'w', encoding='utf-8') as f:
-                json.dump({"instances": active}, f, indent=2, ensure_ascii=False)
-            
-            if len(instances) - len(active) > 0:
-                logger.info(f"清理了 {len(instances) - len(active)} 个已停止的进程记录")
+            _write_instances(active)
+        
+        if len(instances) - len(active) > 0:
+            logger.info(f"清理了 {len(instances) - len(active)} 个已停止的进程记录")
         
         return True
     except Exception as e:
@@ -218,11 +365,9 @@ def get_all_instances() -> list:
     try:
         if not PID_FILE.exists():
             return []
-        with open(PID_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if isinstance(data, dict) and 'instances' in data:
-            return [inst for inst in data['instances'] if is_process_running(inst.get('pid', 0))]
-        return []
+        with _locked_pid_file():
+            instances = _read_instances()
+        return _filter_running(instances)
     except Exception as e:
         logger.error(f"获取实例信息失败: {e}")
         return []
@@ -7,14 +7,37 @@
 import logging
 import subprocess
 import os
+import sys
 import signal
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import json
 import time
+import queue
+import atexit
+import tempfile
+import threading
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# 直接使用当前解释器的绝对路径启动调度器，省去每次启动时在 PATH 中查找 python
+PYTHON_EXECUTABLE = sys.executable or "python"
+
+# 状态写入的合并窗口（秒），窗口内的多次启动/停止只落盘一次
+STATUS_FLUSH_DELAY = 0.2
+
+# 停止调度器时等待进程退出的超时时间和轮询间隔（秒）
+STOP_TIMEOUT = 10
+STOP_POLL_INTERVAL = 0.05
+# 请求线程内最多等待的时间，超过后交给后台回收线程继续等待/强制终止
+STOP_INLINE_WAIT = 0.5
+
 
 class AppRunner:
     """调度器运行管理器"""
@@ -37,26 +60,74 @@ class AppRunner:
         self.single_gpu_script = self.app_dir / "main_gpu.py"
         self.multi_gpu_script = self.app_dir / "main_gpus.py"
         
+        # 启动命令中用到的路径字符串，初始化时转换一次
+        self._script_str = {"single": str(self.single_gpu_script), "multi": str(self.multi_gpu_script)}
+        self._project_root_str = str(self.project_root)
+        self.log_dir = self.project_root / "logs"
+        
         # 命令配置目录
         self.command_dir = self.project_root / "command"
+        self._config_paths: Dict[tuple, Path] = {}
         
         # 运行状态文件
         self.status_file = self.project_root / "control" / "logs" / "app_status.json"
         
-        # 正在运行的进程
+        # 正在运行的进程（与 _stopping 一起由 _procs_lock 保护：请求线程、事件循环和回收线程都会修改）
         self.running_processes: Dict[str, subprocess.Popen] = {}
+        self._procs_lock = threading.Lock()
+        
+        # 调度器子进程的环境变量，初始化时构建一次（Popen 不会修改传入的 env）
+        self._base_env: Dict[str, str] = dict(os.environ)
+        
+        # 状态文件延迟合并写入
+        self._status_lock = threading.Lock()
+        self._status_timer: Optional[threading.Timer] = None
+        self._last_status_content: Optional[bytes] = None
+        
+        # 每个调度器的停止锁，防止并发的重复停止请求
+        self._stop_locks: Dict[str, threading.Lock] = {}
+        
+        # 正在停止中的调度器，以及负责等待其退出的后台回收线程（首次使用时启动）
+        self._stopping: set = set()
+        self._reap_queue: "queue.Queue" = queue.Queue()
+        self._reaper: Optional[threading.Thread] = None
+        
+        # 子进程退出通知：收到 SIGCHLD 后 get_all_status 才重新 poll 所有进程
+        # signal.signal 只能在主线程调用，其他情况下退化为每次查询都 poll
+        self._children_changed = True
+        self._all_status_cache = None
+        try:
+            signal.signal(signal.SIGCHLD, self._on_sigchld)
+            self._sigchld_installed = True
+        except (ValueError, AttributeError):
+            self._sigchld_installed = False
+        atexit.register(self._flush_status)
+    
+    def _forget_process(self, process_key: str, proc: subprocess.Popen):
+        """移除已结束的进程记录（仍是同一个进程时才移除，不会误删同名的新进程）"""
+        with self._procs_lock:
+            if self.running_processes.get(process_key) is proc:
+                self.running_processes.pop(process_key, None)
+            self._stopping.discard(process_key)
     
     def _get_config_file_path(self, mode: str, config_index: int = 0) -> Path:
-        """获取配置文件路径"""
+        """获取配置文件路径（结果按 (mode, config_index) 缓存，路径在运行期间不变）"""
+        cache_key = (mode, config_index)
+        path = self._config_paths.get(cache_key)
+        if path is not None:
+            return path
+        
         if mode == "single":
             base_name = "command_gpu"
         else:
             base_name = "command_gpus"
         
         if config_index == 0:
-            return self.command_dir / f"{base_name}.txt"
+            path = self.command_dir / f"{base_name}.txt"
         else:
-            return self.command_dir / f"{base_name}_{config_index}.txt"
+            path = self.command_dir / f"{base_name}_{config_index}.txt"
+        self._config_paths[cache_key] = path
+        return path
     
     def start_scheduler(self, mode: str, config_index: int = 0) -> Dict[str, Any]:
         """
@@ -73,8 +144,10 @@ class AppRunner:
             # 确定脚本和配置文件
             if mode == "single":
                 script = self.single_gpu_script
+                script_str = self._script_str["single"]
             else:
                 script = self.multi_gpu_script
+                script_str = self._script_str["multi"]
             
             config_file = self._get_config_file_path(mode, config_index)
             
@@ -96,8 +169,9 @@ class AppRunner:
             process_key = f"{mode}_{config_index}"
             
             # 检查是否已经在运行
-            if process_key in self.running_processes:
-                proc = self.running_processes[process_key]
+            with self._procs_lock:
+                proc = self.running_processes.get(process_key)
+            if proc is not None:
                 if proc.poll() is None:  # 进程仍在运行
                     return {
                         "success": False,
@@ -106,7 +180,7 @@ class AppRunner:
             
             # 构建命令
             cmd = [
-                "python", str(script),
+                PYTHON_EXECUTABLE, script_str,
                 "--command-file", str(config_file),
                 "--config-index", str(config_index)
             ]
@@ -115,22 +189,26 @@ class AppRunner:
             logger.info(f"启动调度器: {' '.join(cmd)}")
             
             # 使用 nohup 方式启动，确保进程独立运行
-            log_dir = self.project_root / "logs"
-            log_dir.mkdir(parents=True, exist_ok=True)
+            self.log_dir.mkdir(parents=True, exist_ok=True)
             
-            log_file = log_dir / f"scheduler_{mode}_{config_index}.log"
+            log_file = self.log_dir / f"scheduler_{mode}_{config_index}.log"
             
+            # 注意：调度器有意不随控制面板退出（不设置 PR_SET_PDEATHSIG）。
+            # 面板重启后由 display_state 通过状态文件重新发现并管理已有调度器；
+            # 且本方法运行在 FastAPI 线程池中，PDEATHSIG 绑定的是发起 fork 的线程，
+            # 线程池回收空闲线程时会误杀调度器。
             with open(log_file, "a") as log_f:
                 proc = subprocess.Popen(
                     cmd,
                     stdout=log_f,
                     stderr=subprocess.STDOUT,
-                    cwd=str(self.project_root),
+                    cwd=self._project_root_str,
                     start_new_session=True,  # 创建新会话，使进程独立
-                    env=os.environ.copy()  # 显式传递环境变量，确保 HOME 等变量被继承
+                    env=self._base_env  # 显式传递环境变量，确保 HOME 等变量被继承
                 )
             
-            self.running_processes[process_key] = proc
+            with self._procs_lock:
+                self.running_processes[process_key] = proc
             
             # 保存状态
             self._save_status()
@@ -163,20 +241,29 @@ class AppRunner:
         Returns:
             停止结果
         """
+        process_key = f"{mode}_{config_index}"
+        
+        # 同一调度器的停止请求串行化：已有停止流程在进行时直接返回，不重复发送信号
+        stop_lock = self._stop_locks.setdefault(process_key, threading.Lock())
+        if not stop_lock.acquire(blocking=False):
+            return {
+                "success": False,
+                "message": "调度器正在停止中"
+            }
+        
+        handed_off = False
         try:
-            process_key = f"{mode}_{config_index}"
-            
-            if process_key not in self.running_processes:
+            with self._procs_lock:
+                proc = self.running_processes.get(process_key)
+            if proc is None:
                 return {
                     "success": False,
                     "message": "调度器未在运行"
                 }
             
-            proc = self.running_processes[process_key]
-            
             if proc.poll() is not None:
                 # 进程已经结束
-                del self.running_processes[process_key]
+                self._forget_process(process_key, proc)
                 self._save_status()
                 return {
                     "success": True,
@@ -185,17 +272,29 @@ class AppRunner:
             
             # 发送终止信号
             logger.info(f"停止调度器 PID: {proc.pid}")
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+            pgid = os.getpgid(proc.pid)
+            os.killpg(pgid, signal.SIGTERM)
             
-            # 等待进程结束
-            try:
-                proc.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                # 强制终止
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-                proc.wait()
+            # 请求线程内只短暂等待，大多数调度器会在这段时间内退出
+            started = time.monotonic()
+            inline_deadline = started + STOP_INLINE_WAIT
+            while proc.poll() is None and time.monotonic() < inline_deadline:
+                time.sleep(STOP_POLL_INTERVAL)
+            
+            if proc.poll() is None:
+                # 剩余的等待和强制终止交给后台回收线程，停止锁由回收线程释放
+                with self._procs_lock:
+                    self._stopping.add(process_key)
+                self._reap_queue.put((process_key, proc, pgid, started + STOP_TIMEOUT, stop_lock))
+                self._ensure_reaper()
+                handed_off = True
+                return {
+                    "success": True,
+                    "message": "调度器正在停止",
+                    "stopping": True
+                }
             
-            del self.running_processes[process_key]
+            self._forget_process(process_key, proc)
             self._save_status()
             
             return {
@@ -209,6 +308,52 @@ class AppRunner:
                 "success": False,
                 "message": f"停止失败: {str(e)}"
             }
+        finally:
+            if not handed_off:
+                stop_lock.release()
+    
+    def _ensure_reaper(self):
+        """启动后台回收线程（所有停止中的调度器共用一个线程并行等待）"""
+        with self._status_lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=self._reap_loop, name="scheduler-reaper", daemon=True)
+                self._reaper.start()
+    
+    def _reap_loop(self):
+        """等待停止中的调度器退出，超时后强制终止并回收，避免僵尸进程"""
+        pending = []
+        while True:
+            try:
+                # 没有待回收进程时阻塞等待新任务，否则按轮询间隔检查
+                item = self._reap_queue.get(timeout=STOP_POLL_INTERVAL if pending else None)
+                pending.append(item)
+                continue
+            except queue.Empty:
+                pass
+            
+            now = time.monotonic()
+            still_pending = []
+            for item in pending:
+                process_key, proc, pgid, deadline, stop_lock = item
+                if proc.poll() is None and now < deadline:
+                    still_pending.append(item)
+                    continue
+                # 单个进程的处理出错也必须释放停止锁并清除停止中标记，且不能让回收线程退出
+                try:
+                    if proc.poll() is None:
+                        try:
+                            os.killpg(pgid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        proc.wait()
+                    logger.info(f"调度器已停止 PID: {proc.pid}")
+                except Exception as e:
+                    logger.error(f"回收调度器进程失败 PID: {proc.pid}: {e}")
+                finally:
+                    self._forget_process(process_key, proc)
+                    stop_lock.release()
+                    self._save_status()
+            pending = still_pending
     
     def get_scheduler_status(self, mode: str, config_index: int = 0) -> Dict[str, Any]:
         """
@@ -223,17 +368,18 @@ class AppRunner:
         """
         process_key = f"{mode}_{config_index}"
         
-        if process_key not in self.running_processes:
+        with self._procs_lock:
+            proc = self.running_processes.get(process_key)
+            stopping = process_key in self._stopping
+        if proc is None:
             return {
                 "running": False,
                 "pid": None
             }
         
-        proc = self.running_processes[process_key]
-        
         if proc.poll() is not None:
             # 进程已结束
-            del self.running_processes[process_key]
+            self._forget_process(process_key, proc)
             return {
                 "running": False,
                 "pid": None,
@@ -242,50 +388,107 @@ class AppRunner:
         
         return {
             "running": True,
-            "pid": proc.pid
+            "pid": proc.pid,
+            "stopping": stopping
         }
     
+    def _on_sigchld(self, signum, frame):
+        """SIGCHLD 处理：仅标记有子进程状态变化，由下一次查询统一 poll（不在此处回收，避免抢走其他 subprocess 的退出状态）"""
+        self._children_changed = True
+    
     def get_all_status(self) -> Dict[str, Any]:
-        """获取所有调度器状态"""
+        """获取所有调度器状态（自上次查询以来没有子进程退出时直接返回缓存结果）"""
+        # 在锁内复制一份进程表，回收线程同时删除记录时迭代不会出错
+        with self._procs_lock:
+            items = list(self.running_processes.items())
+            stopping = set(self._stopping)
+        snapshot_key = tuple((key, id(proc), key in stopping) for key, proc in items)
+        if (self._sigchld_installed and not self._children_changed
+                and self._all_status_cache is not None and self._all_status_cache[0] == snapshot_key):
+            return {mode: dict(items) for mode, items in self._all_status_cache[1].items()}
+        
+        # 先清除标记再 poll，poll 期间到达的 SIGCHLD 会留到下一次查询处理
+        self._children_changed = False
+        finished = False
         result = {
             "single": {},
             "multi": {}
         }
         
-        for process_key, proc in list(self.running_processes.items()):
+        for process_key, proc in items:
             mode, config_index = process_key.rsplit("_", 1)
             config_index = int(config_index)
             
             if proc.poll() is None:
                 result[mode][config_index] = {
                     "running": True,
-                    "pid": proc.pid
+                    "pid": proc.pid,
+                    "stopping": process_key in stopping
                 }
             else:
                 result[mode][config_index] = {
                     "running": False,
                     "exit_code": proc.returncode
                 }
-                del self.running_processes[process_key]
+                self._forget_process(process_key, proc)
+                finished = True
         
-        return result
+        # 本次结果中包含已退出的进程时不缓存，退出状态只上报一次
+        if finished:
+            self._all_status_cache = None
+        else:
+            self._all_status_cache = (snapshot_key, result)
+        return {mode: dict(items) for mode, items in result.items()}
     
     def _save_status(self):
-        """保存运行状态到文件"""
+        """请求保存运行状态：短时间内的多次调用合并为一次后台写入，不阻塞启动/停止流程"""
+        with self._status_lock:
+            if self._status_timer is None:
+                self._status_timer = threading.Timer(STATUS_FLUSH_DELAY, self._flush_status)
+                self._status_timer.daemon = True
+                self._status_timer.start()
+    
+    def _flush_status(self):
+        """将当前运行状态写入文件（内容未变化时跳过写入）"""
+        with self._status_lock:
+            self._status_timer = None
+        tmp_file = None
         try:
             status = {}
-            for process_key, proc in self.running_processes.items():
+            with self._procs_lock:
+                items = list(self.running_processes.items())
+            for process_key, proc in items:
                 if proc.poll() is None:
                     status[process_key] = {
                         "pid": proc.pid,
                         "running": True
                     }
             
+            if ORJSON_AVAILABLE:
+                content = orjson.dumps(status, option=orjson.OPT_INDENT_2)
+            else:
+                content = json.dumps(status, indent=2).encode()
+            if content == self._last_status_content:
+                return
+            
             self.status_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.status_file, "w") as f:
-                json.dump(status, f, indent=2)
+            # 定时写入和 atexit 写入可能同时进行，每次写入使用独立的临时文件
+            fd, tmp_file = tempfile.mkstemp(prefix=f"{self.status_file.name}.", suffix=".tmp",
+                                            dir=self.status_file.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.chmod(tmp_file, 0o644)  # mkstemp 创建的文件权限为 0600
+            os.replace(tmp_file, self.status_file)
+            tmp_file = None
+            self._last_status_content = content
         except Exception as e:
             logger.error(f"保存状态失败: {e}")
+        finally:
+            if tmp_file is not None:
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
 
 
 # 全局实例
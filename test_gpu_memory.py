@@ -18,6 +18,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 每次计算的周期（秒）
+ITERATION_PERIOD_SECONDS = 1.0
+
+# 进度日志间隔（秒）
+LOG_INTERVAL_SECONDS = 10.0
+
+# 矩阵乘法的方阵边长上限
+MATMUL_SIDE = 2048
+
+# 显存上限相对目标占用的余量（MB），容纳矩阵乘法结果和 cuBLAS 工作区
+MEMORY_HEADROOM_MB = 256
+
 def test_gpu_memory(duration_seconds=60, memory_mb=500):
     """
     测试GPU内存占用
@@ -41,37 +53,52 @@ def test_gpu_memory(duration_seconds=60, memory_mb=500):
         
         logger.info(f"🚀 Allocating ~{memory_mb}MB GPU memory...")
         
+        # 限制本进程可保留的显存上限（目标占用 + 余量），避免测试脚本意外占用更多显存
+        total_mb = torch.cuda.get_device_properties(device).total_memory / (1024 * 1024)
+        torch.cuda.set_per_process_memory_fraction(min(1.0, (memory_mb + MEMORY_HEADROOM_MB) / total_mb), device)
+        
         # 分配显存
         tensor = torch.randn(num_elements, dtype=torch.float32, device=device)
         
-        # 获取实际分配的显存
-        torch.cuda.synchronize()
+        # 获取实际分配的显存（分配器在主机侧记录，无需同步）
         allocated = torch.cuda.memory_allocated() / (1024 * 1024)
         logger.info(f"✅ Allocated: {allocated:.1f}MB")
         
-        # 执行一些计算以保持GPU活跃
+        # 执行一些计算以保持GPU活跃：每个周期发起一次较大的矩阵乘法后休眠剩余时间，
+        # 避免每 0.1 秒一次的小运算让 Python 和 kernel 启动开销占满 CPU
+        side = min(MATMUL_SIDE, int(num_elements ** 0.5))
+        matrix = tensor[:side * side].view(side, side)
+        out = torch.empty(side, side, dtype=torch.float32, device=device)  # 预分配结果，循环内不再分配显存
+        
         logger.info(f"⏱️ Running for {duration_seconds} seconds...")
         start_time = time.time()
+        next_log_time = start_time + LOG_INTERVAL_SECONDS
         iteration = 0
         
-        while time.time() - start_time < duration_seconds:
-            # 执行简单的矩阵运算
-            _ = torch.matmul(tensor[:1000], tensor[:1000].T)
+        while True:
+            iter_start = time.time()
+            remaining = duration_seconds - (iter_start - start_time)
+            if remaining <= 0:
+                break
+            
+            torch.mm(matrix, matrix.T, out=out)
             iteration += 1
             
-            # 每10秒打印一次进度
-            elapsed = time.time() - start_time
-            if elapsed % 10 < 1 and iteration % 100 == 0:
+            # 每10秒同步一次并打印进度（kernel 异步执行，只在这里等待队列完成）
+            if iter_start >= next_log_time:
+                torch.cuda.synchronize()
+                elapsed = time.time() - start_time
                 logger.info(f"   Progress: {elapsed:.1f}s / {duration_seconds}s (iteration: {iteration})")
+                next_log_time += LOG_INTERVAL_SECONDS
             
-            time.sleep(0.1)
+            time.sleep(max(0.0, min(ITERATION_PERIOD_SECONDS - (time.time() - iter_start), remaining)))
         
         logger.info(f"✅ Test completed successfully!")
         logger.info(f"   Total iterations: {iteration}")
         logger.info(f"   Total time: {time.time() - start_time:.1f}s")
         
         # 清理
-        del tensor
+        del tensor, matrix, out
         torch.cuda.empty_cache()
         
         return True